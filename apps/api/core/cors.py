@@ -0,0 +1,50 @@
+# apps/api/core/cors.py
+# Minimal pure-ASGI CORS layer for a fixed origin allowlist.
+# Answers preflights directly (before routing) and stamps the allow headers on responses;
+# requests without an allowed Origin pass straight through untouched.
+
+from typing import Iterable
+
+_ALLOW_METHODS = b"GET, POST, OPTIONS"
+_MAX_AGE = b"600"
+
+
+class StaticCORSMiddleware:
+    def __init__(self, app, origins: Iterable[str]):
+        self.app = app
+        self.origins = {o.encode("latin-1") for o in origins}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        origin = headers.get(b"origin")
+        if origin not in self.origins:
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+        if scope["method"] == "OPTIONS" and b"access-control-request-method" in headers:
+            cors_headers += [
+                (b"access-control-allow-methods", _ALLOW_METHODS),
+                (b"access-control-allow-headers", headers.get(b"access-control-request-headers", b"*")),
+                (b"access-control-max-age", _MAX_AGE),
+                (b"content-length", b"0"),
+            ]
+            await send({"type": "http.response.start", "status": 204, "headers": cors_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
@@ -1,15 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Literal, Optional, Dict, Any
 
-class Length(BaseModel):
+class _Schema(BaseModel):
+    # Request/response models are never mutated after validation, so freeze them;
+    # unknown keys from the frontend are dropped rather than stored.
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+class Length(_Schema):
     unit: Literal["min"] = "min"
     value: int = 3
 
-class Research(BaseModel):
+class Research(_Schema):
     web_search: bool = False
-    sources: List[str] = []
+    sources: List[str] = Field(default_factory=list)
 
-class Visuals(BaseModel):
+class Visuals(_Schema):
     # Animation-first defaults; SDXL only if truly needed
     use_generated_images: Literal["auto","none","force"] = "auto"
     style: str = "kurzgesagt-flat-vector"
@@ -20,46 +25,52 @@ class Visuals(BaseModel):
     aspect: Literal["landscape","portrait","square"] = "landscape"
     # Height in pixels (the tall edge); width is derived from aspect
     target_height: int = 1080   # 1080p ? 1920x1080 (landscape) or 1080x1920 (portrait)
+    # Captions ship as a soft subtitle track; burning them in re-encodes the whole video
+    burn_subtitles: bool = False
 
-class Voice(BaseModel):
+class Voice(_Schema):
     # Pass an absolute path to Piper .onnx in the request or set it here
     speaker: str = "/workspace/learn-gen/voices/piper/en_US-norman-medium.onnx"
     pace_wpm: int = 145
     tone: str = "energetic"
 
-class Structure(BaseModel):
+class Structure(_Schema):
     # Fewer, richer animated beats by default
     beats_per_min: int = 9
     cta: bool = False
     quizlets: int = 0
 
-class Config(BaseModel):
+class Config(_Schema):
     topic: str
     length: Length = Length()
     research: Research = Research()
     visuals: Visuals = Visuals()
     voice: Voice = Voice()
     structure: Structure = Structure()
+    # Reuse the stored plan for an identical request instead of re-running the LLM
+    reuse_plan: bool = True
 
-class Onscreen(BaseModel):
+class Onscreen(_Schema):
     title: Optional[str] = None
-    bullets: List[str] = []
+    bullets: List[str] = Field(default_factory=list)
     diagram: Optional[Dict[str, Any]] = None    # e.g., {"kind":"timeline"|"diagram"|"path", ...}
     anim_path: Optional[Dict[str, Any]] = None   # path parameters if any
-    assets: Dict[str, Any] = {"need_image": False, "style": "kurzgesagt-flat-vector", "reference_terms": [], "subject": None}
+    assets: Dict[str, Any] = Field(
+        default_factory=lambda: {"need_image": False, "style": "kurzgesagt-flat-vector", "reference_terms": [], "subject": None}
+    )
 
-class Beat(BaseModel):
+class Beat(_Schema):
     type: Literal["layout","diagram","timeline","anim_path"]
     narration: str
     onscreen: Onscreen = Onscreen()
     duration_s: float = 6.0
 
-class Section(BaseModel):
+class Section(_Schema):
     id: str
     goal: str
     beats: List[Beat]
 
-class Plan(BaseModel):
+class Plan(_Schema):
     topic: str
     length_min: int
     sections: List[Section]
@@ -0,0 +1,23 @@
+# apps/api/core/validation.py
+# Module-level TypeAdapters for the hot request/response models.
+# The validator/serializer is built once at import and reused for every request.
+
+from typing import Any
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from .schemas import Config, Plan
+
+CONFIG = TypeAdapter(Config)
+PLAN = TypeAdapter(Plan)
+
+
+def parse_config(body: Any) -> Config:
+    """Validate a raw JSON body into a Config, raising FastAPI's usual 422 on failure."""
+    try:
+        return CONFIG.validate_python(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
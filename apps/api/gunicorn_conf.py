@@ -0,0 +1,16 @@
+# apps/api/gunicorn_conf.py
+# Production server shape: gunicorn -c apps/api/gunicorn_conf.py apps.api.main:app
+#
+# UvicornWorker picks uvloop + httptools automatically when uvicorn[standard] is installed.
+# Every worker keeps its own copy of any model it loads (LLM, SDXL, Whisper), so lower
+# WEB_CONCURRENCY on GPU boxes rather than running one worker per core.
+
+import os
+
+bind = os.getenv("LEARNGEN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app before forking so already-loaded modules are shared copy-on-write.
+preload_app = True
+# Renders and LLM calls can take minutes; don't let the arbiter kill busy workers.
+timeout = int(os.getenv("LEARNGEN_WORKER_TIMEOUT", "900"))
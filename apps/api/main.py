@@ -1,15 +1,26 @@
-﻿from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+﻿import importlib
+import os
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from .core.cors import StaticCORSMiddleware
 from .routers import plan, assets, generate
 
-app = FastAPI(title="Learn-Gen API", version="0.1")
+app = FastAPI(title="Learn-Gen API", version="0.1", default_response_class=ORJSONResponse)
+
+# Explicit origins (comma-separated) instead of "*"; defaults to the local Next.js UI.
+# Set LEARNGEN_CORS_ORIGINS="" for internal server-to-server deployments to drop CORS entirely.
+CORS_ORIGINS = [o.strip() for o in os.getenv("LEARNGEN_CORS_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], allow_credentials=True,
-    allow_methods=["*"], allow_headers=["*"],
-)
+if CORS_ORIGINS:
+    app.add_middleware(StaticCORSMiddleware, origins=CORS_ORIGINS)
 
 app.include_router(plan.router, prefix="/v1")
 app.include_router(assets.router, prefix="/v1")
 app.include_router(generate.router, prefix="/v1")
+
+# Engines are imported lazily by the routers. CI can set LEARNGEN_EAGER_IMPORT=1 to
+# import them at boot and surface broken deferred imports before the first request.
+if os.getenv("LEARNGEN_EAGER_IMPORT") == "1":
+    for _engine in ("anim", "captions", "tts", "llm", "orchestrate"):
+        importlib.import_module(f"packages.engines.{_engine}")
@@ -1,15 +1,28 @@
 ﻿# apps/api/routers/assets.py
-# Assets endpoints with LAZY image engine import.
-# We only import the images module inside the /images route so the API runs fine
-# when visuals.use_generated_images="none" and diffusers/torchvision are not installed.
+# Assets endpoints with LAZY engine imports.
+# Every engine is imported inside its route so workers don't pay for piper/whisper/PIL
+# (or diffusers/torchvision for /images) until that route is actually hit.
 
+import os
+
+import anyio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
-from packages.engines import tts, captions, anim  # note: images is NOT imported here
 
 router = APIRouter(tags=["assets"])
 
+# Caps concurrent /anim renders so a burst of requests can't start one ffmpeg per request.
+# Created lazily because anyio limiters must be built inside the running event loop.
+_anim_limiter = None
+
+
+def _get_anim_limiter() -> anyio.CapacityLimiter:
+    global _anim_limiter
+    if _anim_limiter is None:
+        _anim_limiter = anyio.CapacityLimiter(os.cpu_count() or 4)
+    return _anim_limiter
+
 
 # ---------- Images ----------
 
@@ -19,19 +32,38 @@ class ImageTask(BaseModel):
     seed: int = 42
 
 
+def _render_images(images, pipe, tasks: List[ImageTask]) -> List[str]:
+    # One batched diffusion call per image size; paths come back in request order.
+    by_size = {}
+    for i, t in enumerate(tasks):
+        by_size.setdefault(t.size, []).append((i, t))
+
+    out_paths = [None] * len(tasks)
+    for size, group in by_size.items():
+        indices = [i for i, _ in group]
+        paths = images.render_batch(
+            pipe,
+            [t.prompt for _, t in group],
+            indices,
+            size=size,
+            seeds=[t.seed for _, t in group],
+        )
+        for i, p in zip(indices, paths):
+            out_paths[i] = p
+    return out_paths
+
+
 @router.post("/images")
 async def make_images(tasks: List[ImageTask]):
     # Lazy import so the server doesn't load diffusers unless we actually call this route.
+    # Pipeline load and diffusion are blocking, so both run in a worker thread.
     try:
         from packages.engines import images
-        pipe = images.get_pipe()
+        pipe = await anyio.to_thread.run_sync(images.get_pipe)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Image engine unavailable: {e}")
 
-    out_paths = []
-    for i, t in enumerate(tasks):
-        p = images.render(pipe, t.prompt, index=i, size=t.size, seed=t.seed)
-        out_paths.append(p)
+    out_paths = await anyio.to_thread.run_sync(_render_images, images, pipe, tasks)
     return {"paths": out_paths}
 
 
@@ -44,14 +76,16 @@ class TTSTask(BaseModel):
 
 @router.post("/voice")
 async def voice(task: TTSTask):
-    return {"wav": tts.synthesize(task.text, task.model_path)}
+    from packages.engines import tts
+    return {"wav": await anyio.to_thread.run_sync(tts.synthesize, task.text, task.model_path)}
 
 
 # ---------- Captions (Whisper) ----------
 
 @router.post("/captions")
 async def caps(wav: str):
-    return {"srt": captions.to_srt(wav)}
+    from packages.engines import captions
+    return {"srt": await anyio.to_thread.run_sync(captions.to_srt, wav)}
 
 
 # ---------- Procedural animation clip ----------
@@ -65,4 +99,8 @@ class AnimTask(BaseModel):
 
 @router.post("/anim")
 async def make_anim(task: AnimTask):
-    return {"mp4": anim.render(task.spec, task.duration_s, task.title, task.bullets)}
+    from packages.engines import anim
+    # render_async draws frames off the event loop and awaits ffmpeg without blocking.
+    async with _get_anim_limiter():
+        mp4 = await anim.render_async(task.spec, task.duration_s, task.title, task.bullets)
+    return {"mp4": mp4}
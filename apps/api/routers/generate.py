@@ -1,10 +1,13 @@
-﻿from fastapi import APIRouter
-from ..core.schemas import Config
-from packages.engines import orchestrate
+﻿from typing import Any, Dict
+
+from fastapi import APIRouter, Body
+from ..core.validation import parse_config
 
 router = APIRouter(tags=["generate"])
 
 @router.post("/generate")
-async def generate(cfg: Config):
+async def generate(body: Dict[str, Any] = Body(...)):
+    cfg = parse_config(body)
+    from packages.engines import orchestrate  # lazy: pulls in torch/whisper/PIL
     result = await orchestrate.run(cfg)
     return result  # {"plan":..., "assets": {...}, "final_mp4": "..."}
@@ -1,12 +1,38 @@
-﻿from fastapi import APIRouter
+﻿import functools
+from typing import Any, Dict
+
+import anyio
+from fastapi import APIRouter, Body
+from fastapi.responses import ORJSONResponse
 from ..core.schemas import Config, Plan
-from packages.engines import llm as llm_engine
+from ..core.validation import CONFIG, PLAN, parse_config
 
 router = APIRouter(tags=["plan"])
 
-@router.post("/plan", response_model=Plan)
-async def make_plan(cfg: Config):
+
+def _produce_plan(cfg: Config) -> dict:
+    from packages.engines import llm as llm_engine  # lazy: pulls in torch/transformers
     words = cfg.length.value * cfg.voice.pace_wpm
     beats_total = cfg.length.value * cfg.structure.beats_per_min
     plan_dict = llm_engine.produce_plan(cfg.topic, beats_total, words, cfg)
-    return Plan(**plan_dict)
+    # Validate once here; the route returns the JSON-ready dict without re-validating it.
+    return PLAN.dump_python(PLAN.validate_python(plan_dict), mode="json")
+
+
+# Identical configs (UI retries, eval sweeps) reuse the plan instead of re-running the LLM;
+# ?nocache=1 or reuse_plan=false in the body skips it.
+# Keyed by the canonical JSON dump so equal configs hit regardless of field order.
+@functools.lru_cache(maxsize=256)
+def _cached_plan(cfg_json: str) -> dict:
+    return _produce_plan(CONFIG.validate_json(cfg_json))
+
+
+# response_model documents the schema; returning a Response skips FastAPI's re-validation.
+@router.post("/plan", response_model=Plan)
+async def make_plan(body: Dict[str, Any] = Body(...), nocache: bool = False):
+    cfg = parse_config(body)
+    if nocache or not cfg.reuse_plan:
+        plan_dict = await anyio.to_thread.run_sync(_produce_plan, cfg)
+    else:
+        plan_dict = await anyio.to_thread.run_sync(_cached_plan, cfg.model_dump_json())
+    return ORJSONResponse(plan_dict)
@@ -86,7 +86,9 @@ export default function GenerateForm({
       targetHeight: DEFAULTS.portraitHeight,
       voicePath: DEFAULTS.voicePath,
       paceWpm: 150,
-      webSearch: false
+      webSearch: false,
+      // The in-page <video> player ignores soft subtitle tracks, so burn captions in by default.
+      burnSubtitles: true
     }
   });
 
@@ -126,7 +128,8 @@ export default function GenerateForm({
         fps: 30,
         animation_mode: "cinematic",
         aspect: values.aspect,
-        target_height: values.targetHeight
+        target_height: values.targetHeight,
+        burn_subtitles: values.burnSubtitles
       },
       voice: {
         speaker: values.voicePath,
@@ -356,6 +359,30 @@ export default function GenerateForm({
                   </FormItem>
                 )}
               />
+
+              <FormField
+                control={form.control}
+                name="burnSubtitles"
+                render={({ field }) => (
+                  <FormItem className="flex flex-row items-center justify-between rounded-2xl border border-slate-200 bg-slate-50/70 px-4 py-3">
+                    <div className="space-y-0.5">
+                      <FormLabel className="text-sm font-semibold text-slate-800">
+                        Burn in captions
+                      </FormLabel>
+                      <FormDescription>
+                        Draw captions into the video so every player shows them. Turn off
+                        for a faster render with a separate subtitle track.
+                      </FormDescription>
+                    </div>
+                    <FormControl>
+                      <Switch
+                        checked={field.value}
+                        onCheckedChange={field.onChange}
+                      />
+                    </FormControl>
+                  </FormItem>
+                )}
+              />
             </div>
           </SheetContent>
         </Sheet>
@@ -29,7 +29,8 @@ export const generateFormSchema = z.object({
     .int("Use a whole number.")
     .min(80, "Minimum is 80 WPM.")
     .max(240, "Maximum is 240 WPM."),
-  webSearch: z.boolean()
+  webSearch: z.boolean(),
+  burnSubtitles: z.boolean()
 });
 
 export type GenerateFormValues = z.infer<typeof generateFormSchema>;
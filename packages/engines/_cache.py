@@ -0,0 +1,73 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Awaitable, Callable, Optional
+
+# Content-addressed store for engine outputs (narration wavs, backgrounds, clips):
+# identical inputs map to the same file, so repeat runs skip the expensive step.
+CACHE_DIR = os.getenv("LEARNGEN_CACHE_DIR", "data/cache")
+
+
+def cache_key(**fields) -> bytes:
+    """Stable key bytes for ``fields`` (JSON with sorted keys)."""
+    return json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def cache_entry(kind: str, key_bytes: bytes, ext: str) -> str:
+    """Path where the ``kind`` output for ``key_bytes`` lives (it may not exist yet)."""
+    folder = os.path.join(CACHE_DIR, kind)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, hashlib.sha256(key_bytes).hexdigest() + ext)
+
+
+def temp_path(path: str) -> str:
+    """A unique scratch path next to cache ``path`` for a producer to write into."""
+    folder, name = os.path.split(path)
+    # Keep the extension last so ffmpeg/piper still infer the container from it.
+    return os.path.join(folder, f".{uuid.uuid4().hex}.tmp{os.path.splitext(name)[1]}")
+
+
+def store(produced: str, path: str) -> str:
+    """Move a freshly produced file into its cache ``path`` atomically."""
+    try:
+        os.replace(produced, path)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+        # Produced on another filesystem: copy next to the entry first, then rename.
+        tmp = temp_path(path)
+        shutil.move(produced, tmp)
+        os.replace(tmp, path)
+    return path
+
+
+def _paths(kind: str, key_bytes: bytes, ext: str):
+    path = cache_entry(kind, key_bytes, ext)
+    return path, temp_path(path)
+
+
+def cached_path(
+    kind: str, key_bytes: bytes, producer_fn: Callable[[str], Optional[str]], ext: str, force: bool = False
+) -> str:
+    """Return the cached ``kind`` file for ``key_bytes``, calling ``producer_fn(out_path)`` on a miss.
+
+    ``force`` re-produces and replaces the entry even when it exists.
+    """
+    path, tmp = _paths(kind, key_bytes, ext)
+    if not force and os.path.exists(path):
+        return path
+    # Producers either write to the path they are given or return the path they wrote.
+    return store(producer_fn(tmp) or tmp, path)
+
+
+async def cached_path_async(
+    kind: str, key_bytes: bytes, producer_fn: Callable[[str], Awaitable[Optional[str]]], ext: str
+) -> str:
+    """``cached_path`` for coroutine producers."""
+    path, tmp = _paths(kind, key_bytes, ext)
+    if os.path.exists(path):
+        return path
+    return store(await producer_fn(tmp) or tmp, path)
@@ -1,25 +1,45 @@
 # packages/engines/anim.py
 # Procedural clip generator tuned for vibrant, flat-vector Kurzgesagt-style visuals.
+# Frame time is dominated by Pillow's alpha_composite / GaussianBlur / resize; Pillow-SIMD
+# is a drop-in replacement with SSE4/AVX2 paths for those (see README, Backend Deployment).
 
+import asyncio
+import collections
+import functools
 import hashlib
+import itertools
 import math
+import multiprocessing
 import os
+import pickle
 import random
 import subprocess
+import tempfile
+import threading
 import uuid
-from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
 
 ANIM_OUT = "data/anims"
+os.makedirs(ANIM_OUT, exist_ok=True)
 FPS_DEFAULT = 30
-
-# Try a system font; fall back to default
-try:
-    FONT_PATH = "arial.ttf"
-    _ = ImageFont.truetype(FONT_PATH, 36)
-except Exception:
-    FONT_PATH = None
+# Part of the clip cache key (orchestrate); bump it whenever a change alters rendered frames.
+RENDER_VERSION = 1
+# Frame-rendering processes per clip; set LEARNGEN_ANIM_WORKERS=1 to render in-process.
+ANIM_WORKERS = int(os.getenv("LEARNGEN_ANIM_WORKERS", "0")) or (os.cpu_count() or 1)
+# Frames per worker task.
+FRAME_CHUNK = 4
+# Force an encoder (libx264, h264_nvenc, h264_vaapi); unset to pick the fastest available.
+VIDEO_ENCODER = os.getenv("LEARNGEN_VIDEO_ENCODER")
+VAAPI_DEVICE = os.getenv("LEARNGEN_VAAPI_DEVICE", "/dev/dri/renderD128")
+
+# System font, resolved lazily by _font (which falls back to Pillow's default) so importing
+# this module, and every spawned frame worker, doesn't parse a TTF up front.
+FONT_PATH = "arial.ttf"
 
 try:
     RESAMPLE_LANCZOS = Image.Resampling.LANCZOS  # type: ignore[attr-defined]
@@ -59,10 +79,7 @@ PALETTES = (
 )
 
 
-def _ensure_dir(path: str) -> None:
-    os.makedirs(path, exist_ok=True)
-
-
+@functools.lru_cache(maxsize=32)
 def _font(size: int) -> ImageFont.FreeTypeFont:
     if FONT_PATH:
         try:
@@ -99,31 +116,53 @@ def _mix(color: Tuple[int, int, int], target: Tuple[int, int, int], factor: floa
     return tuple(int(c * (1 - factor) + t * factor) for c, t in zip(color, target))
 
 
-def _palette_for(seed: str) -> dict:
-    idx = int(hashlib.sha1(seed.encode("utf-8")).hexdigest(), 16) % len(PALETTES)
-    raw = PALETTES[idx]
-    return {
+# PALETTES decoded to RGB tuples once; _palette_for hands these out shared, so treat them as read-only.
+_PALETTES_RGB = tuple(
+    {
         "bg": (_hex_to_rgb(raw["bg"][0]), _hex_to_rgb(raw["bg"][1])),
         "primary": _hex_to_rgb(raw["primary"]),
         "secondary": _hex_to_rgb(raw["secondary"]),
         "accent": _hex_to_rgb(raw["accent"]),
         "neutral": _hex_to_rgb(raw["neutral"]),
     }
+    for raw in PALETTES
+)
 
 
-def _vertical_gradient(size: Tuple[int, int], top: Tuple[int, int, int], bottom: Tuple[int, int, int]) -> Image.Image:
+def _seed_int(seed: str) -> int:
+    # Same value as int(sha1.hexdigest(), 16), without the hex round-trip.
+    return int.from_bytes(hashlib.sha1(seed.encode("utf-8")).digest(), "big")
+
+
+@functools.lru_cache(maxsize=128)
+def _palette_for(seed: str) -> dict:
+    return _PALETTES_RGB[_seed_int(seed) % len(_PALETTES_RGB)]
+
+
+def _vertical_gradient(
+    size: Tuple[int, int],
+    top: Tuple[int, int, int],
+    bottom: Tuple[int, int, int],
+    alpha: Optional[int] = None,
+) -> Image.Image:
+    """Top-to-bottom gradient; RGB, or RGBA with a constant ``alpha`` when given."""
     width, height = size
-    base = Image.new("RGB", (width, height), top)
-    mask = Image.new("L", (1, height))
-    for y in range(height):
-        mask.putpixel((0, y), int(255 * (y / max(1, height - 1))))
-    mask = mask.resize((width, height))
-    overlay = Image.new("RGB", (width, height), bottom)
-    return Image.composite(overlay, base, mask)
+    # One row colour per y (same 0..255 ramp the old per-row putpixel mask used),
+    # then broadcast across the width in a single fill.
+    ramp = (np.arange(height) * 255 // max(1, height - 1)).astype(np.float32)[:, None] / 255.0
+    top_rgb = np.asarray(top, dtype=np.float32)
+    rows = top_rgb + (np.asarray(bottom, dtype=np.float32) - top_rgb) * ramp
+    rows = np.clip(rows + 0.5, 0, 255).astype(np.uint8)
+    mode = "RGB"
+    if alpha is not None:
+        # Build the alpha channel into the same fill rather than converting afterwards.
+        rows = np.concatenate([rows, np.full((height, 1), alpha, dtype=np.uint8)], axis=1)
+        mode = "RGBA"
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(rows[:, None, :], (height, width, len(mode)))), mode)
 
 
 def _build_background(width: int, height: int, palette: dict, rng: random.Random) -> Image.Image:
-    grad = _vertical_gradient((width, height), palette["bg"][0], palette["bg"][1]).convert("RGBA")
+    grad = _vertical_gradient((width, height), palette["bg"][0], palette["bg"][1], alpha=255)
 
     glow_layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     glow_draw = ImageDraw.Draw(glow_layer)
@@ -137,15 +176,15 @@ def _build_background(width: int, height: int, palette: dict, rng: random.Random
     glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=int(min(width, height) * 0.27)))
     combined = Image.alpha_composite(grad, glow_layer)
 
-    grain = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    grain_draw = ImageDraw.Draw(grain)
+    # Thousands of single-pixel specks: scatter them with one fancy-index write.
+    np_rng = np.random.default_rng(rng.getrandbits(64))
     dot_count = int(width * height * 0.0025)
-    for _ in range(dot_count):
-        x = rng.randrange(width)
-        y = rng.randrange(height)
-        alpha = rng.randint(10, 24)
-        grain_draw.point((x, y), fill=palette["neutral"] + (alpha,))
-    grain = grain.filter(ImageFilter.GaussianBlur(radius=1))
+    xs = np_rng.integers(0, width, dot_count)
+    ys = np_rng.integers(0, height, dot_count)
+    grain_arr = np.zeros((height, width, 4), dtype=np.uint8)
+    grain_arr[ys, xs, :3] = palette["neutral"]
+    grain_arr[ys, xs, 3] = np_rng.integers(10, 25, dot_count, dtype=np.uint8)
+    grain = Image.fromarray(grain_arr, "RGBA").filter(ImageFilter.GaussianBlur(radius=1))
 
     return Image.alpha_composite(combined, grain)
 
@@ -156,25 +195,49 @@ def _apply_background_image(base: Image.Image, width: int, height: int, palette:
     try:
         bg = Image.open(path).convert("RGBA")
         bg = ImageOps.fit(bg, (width, height), method=RESAMPLE_LANCZOS)
-        tint = Image.new("RGBA", (width, height), palette["bg"][0] + (70,))
-        bg = Image.alpha_composite(bg, tint)
-        merged = Image.blend(bg, base, alpha=0.4)
-        return merged
     except Exception:
         return base
+    # Tint (alpha 70 "over" the image) and 60/40 blend with the procedural base in one
+    # NumPy pass, instead of allocating a solid tint frame and two intermediate images.
+    src = np.asarray(bg, dtype=np.float32) / 255.0
+    tint_a = 70 / 255.0
+    tint_rgb = np.asarray(palette["bg"][0], dtype=np.float32) / 255.0
+    dst_a = src[..., 3:4]
+    out_a = tint_a + dst_a * (1 - tint_a)
+    tinted = np.empty_like(src)
+    tinted[..., :3] = (tint_rgb * tint_a + src[..., :3] * dst_a * (1 - tint_a)) / out_a
+    tinted[..., 3:4] = out_a
+    merged = tinted * 0.6 + (np.asarray(base, dtype=np.float32) / 255.0) * 0.4
+    return Image.fromarray(np.clip(merged * 255.0 + 0.5, 0, 255).astype(np.uint8), "RGBA")
+
+
+# Pixel footprints of ImageDraw.ellipse((x, y, x + size, y + size)) for star sizes 1..3.
+_STAR_STAMPS = (
+    ((0, 0), (1, 0), (0, 1), (1, 1)),
+    ((1, 0), (0, 1), (1, 1), (2, 1), (1, 2)),
+    ((1, 0), (2, 0), (0, 1), (1, 1), (2, 1), (3, 1), (0, 2), (1, 2), (2, 2), (3, 2), (1, 3), (2, 3)),
+)
 
 
 def _make_star_field(width: int, height: int, rng: random.Random, palette: dict) -> Image.Image:
-    layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(layer)
+    np_rng = np.random.default_rng(rng.getrandbits(64))
     count = int(width * height * 0.00014)
-    for _ in range(count):
-        x = rng.randrange(width)
-        y = rng.randrange(height)
-        size = rng.randint(1, 3)
-        alpha = rng.randint(90, 150)
-        draw.ellipse((x, y, x + size, y + size), fill=palette["neutral"] + (alpha,))
-    return layer
+    xs = np_rng.integers(0, width, count)
+    ys = np_rng.integers(0, height, count)
+    sizes = np_rng.integers(1, 4, count)
+    alphas = np_rng.integers(90, 151, count, dtype=np.uint8)
+
+    arr = np.zeros((height, width, 4), dtype=np.uint8)
+    arr[..., :3] = palette["neutral"]
+    alpha = arr[..., 3]
+    for size, stamp in enumerate(_STAR_STAMPS, start=1):
+        sel = sizes == size
+        sx, sy, sa = xs[sel], ys[sel], alphas[sel]
+        for dx, dy in stamp:
+            px, py = sx + dx, sy + dy
+            inside = (px < width) & (py < height)
+            alpha[py[inside], px[inside]] = sa[inside]
+    return Image.fromarray(arr, "RGBA")
 
 
 def _draw_title(img: Image.Image, title: str, palette: dict) -> None:
@@ -189,6 +252,26 @@ def _draw_title(img: Image.Image, title: str, palette: dict) -> None:
     draw.text((x, y), title, fill=palette["neutral"], font=font)
 
 
+_SCRATCH = threading.local()
+
+
+def _scratch(size: Tuple[int, int]) -> Image.Image:
+    """A cleared, transparent RGBA layer of ``size``, reused per thread for per-frame overlays.
+
+    Only valid until the next ``_scratch`` call on this thread; callers draw into it and
+    composite (or filter into a new image) straight away.
+    """
+    bufs = getattr(_SCRATCH, "bufs", None)
+    if bufs is None:
+        bufs = _SCRATCH.bufs = {}
+    buf = bufs.get(size)
+    if buf is None:
+        buf = bufs[size] = Image.new("RGBA", size, (0, 0, 0, 0))
+    else:
+        buf.paste((0, 0, 0, 0), (0, 0) + size)
+    return buf
+
+
 def _draw_bullets(img: Image.Image, bullets: List[str], palette: dict) -> Image.Image:
     if not bullets:
         return img
@@ -197,6 +280,9 @@ def _draw_bullets(img: Image.Image, bullets: List[str], palette: dict) -> Image.
     pill_height = int(img.height * 0.08)
     line_gap = int(img.height * 0.105)
     font_size = max(28, img.width // 42)
+    # One transparent layer serves every shadow and pill; each is composited (or blurred
+    # into a new image) before the next clears it.
+    layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
     for idx, bullet in enumerate(bullets[:4]):
         top = int(img.height * 0.26) + idx * line_gap
         rect = (
@@ -205,16 +291,15 @@ def _draw_bullets(img: Image.Image, bullets: List[str], palette: dict) -> Image.
             img.width - margin,
             top + pill_height,
         )
-        shadow = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow)
-        shadow_draw.rounded_rectangle(rect, radius=pill_height // 2, fill=(0, 0, 0, 70))
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=6))
-        result = Image.alpha_composite(result, shadow)
+        if idx:
+            layer.paste((0, 0, 0, 0), (0, 0) + img.size)
+        layer_draw = ImageDraw.Draw(layer)
+        layer_draw.rounded_rectangle(rect, radius=pill_height // 2, fill=(0, 0, 0, 70))
+        result = Image.alpha_composite(result, layer.filter(ImageFilter.GaussianBlur(radius=6)))
 
-        pill_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        pill_draw = ImageDraw.Draw(pill_layer)
-        pill_draw.rounded_rectangle(rect, radius=pill_height // 2, fill=palette["primary"] + (235,))
-        result = Image.alpha_composite(result, pill_layer)
+        layer.paste((0, 0, 0, 0), (0, 0) + img.size)
+        layer_draw.rounded_rectangle(rect, radius=pill_height // 2, fill=palette["primary"] + (235,))
+        result = Image.alpha_composite(result, layer)
 
         draw = ImageDraw.Draw(result)
         text_x = rect[0] + int(pill_height * 0.55)
@@ -248,183 +333,353 @@ def _draw_reference_badge(img: Image.Image, references: List[str], palette: dict
     return img
 
 
-def _encode_frames_to_mp4(frames_dir: str, fps: int, out_path: str) -> str:
+def _reference_badge(
+    size: Tuple[int, int], references: List[str], palette: dict
+) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+    """Pre-render the badge once: a cropped RGBA overlay and where it goes, or None."""
+    if not references:
+        return None
+    layer = _draw_reference_badge(Image.new("RGBA", size, (0, 0, 0, 0)), references, palette)
+    bbox = layer.getbbox()
+    return layer.crop(bbox), bbox[:2]
+
+
+@functools.lru_cache(maxsize=1)
+def _video_encoder() -> str:
+    """Return the H.264 encoder to use, preferring GPU encoders when a device is present."""
+    if VIDEO_ENCODER:
+        return VIDEO_ENCODER
+    try:
+        out = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return "libx264"
+    if b"h264_nvenc" in out and os.path.exists("/dev/nvidia0"):
+        return "h264_nvenc"
+    if b"h264_vaapi" in out and os.path.exists(VAAPI_DEVICE):
+        return "h264_vaapi"
+    return "libx264"
+
+
+def _encoder_args(encoder: str, preset: str, tune: Optional[str]) -> Tuple[List[str], List[str]]:
+    """Return (input, output) ffmpeg arguments for ``encoder``."""
+    if encoder == "h264_nvenc":
+        return [], [
+            "-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll",
+            "-rc", "vbr", "-cq", "23", "-b:v", "0", "-pix_fmt", "yuv420p",
+        ]
+    if encoder == "h264_vaapi":
+        return ["-vaapi_device", VAAPI_DEVICE], ["-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi"]
+    return [], [
+        "-c:v",
+        "libx264",
+        "-preset",
+        preset,
+        *(["-tune", tune] if tune else []),
+        "-threads",
+        "0",
+        "-pix_fmt",
+        "yuv420p",
+    ]
+
+
+def _ffmpeg_cmd(
+    width: int,
+    height: int,
+    fps: int,
+    out_path: str,
+    preset: str = "veryfast",
+    tune: Optional[str] = "stillimage",
+) -> List[str]:
+    """Build an ffmpeg command that encodes raw RGB frames read from stdin."""
+    input_args, output_args = _encoder_args(_video_encoder(), preset, tune)
     cmd = [
         "ffmpeg",
         "-y",
-        "-r",
-        str(fps),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        *input_args,
         "-f",
-        "image2",
-        "-i",
-        os.path.join(frames_dir, "%06d.png"),
-        "-c:v",
-        "libx264",
+        "rawvideo",
         "-pix_fmt",
-        "yuv420p",
-        "-vf",
-        f"fps={fps}",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-framerate",
+        str(fps),
+        "-i",
+        "-",
+        "-an",
+        "-sn",
+        "-dn",
+        *output_args,
+        "-movflags",
+        "+faststart",
         out_path,
     ]
-    subprocess.run(cmd, check=True)
-    return out_path
+    return cmd
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
-def _render_timeline(
+def _prepare_timeline(
     background: Image.Image,
     palette: dict,
     title: str,
     items: List[str],
     nframes: int,
     references: List[str],
-) -> List[Image.Image]:
-    frames: List[Image.Image] = []
-    width, height = background.size
-    line_y = int(height * 0.58)
+) -> dict:
+    base = background.copy()
+    _draw_title(base, title, palette)
+
+    # Layout depends only on size and items, so compute it once rather than per frame.
+    width, height = base.size
     left = int(width * 0.1)
     right = int(width * 0.9)
+    line_y = int(height * 0.58)
     radius = max(12, width // 140)
+    span = max(1, len(items) - 1)
+    item_xs = [int(left + idx * (right - left) / span) for idx in range(len(items))]
+
+    # Label tags: measure each label once and keep the tag rect and text origin.
+    label_size = max(24, width // 46)
+    label_font = _font(label_size)
+    measure = ImageDraw.Draw(base)
+    label_boxes = []
+    for label, x in zip(items, item_xs):
+        tw, th = _measure_text(measure, label, label_font)
+        rect = (x - tw // 2 - 16, line_y - radius - th - 20, x + tw // 2 + 16, line_y - radius - 12)
+        label_boxes.append((rect, (x - tw // 2, rect[1] + 4)))
+
+    # Every item gets the same soft pulse behind it, so blur it once and stamp it per item.
+    pad = _blur_margin(4)
+    side = 4 * radius + 2 * pad + 1
+    pulse = _blurred_shape(
+        (side, side), "ellipse", [(pad, pad), (side - pad - 1, side - pad - 1)], 4,
+        fill=palette["accent"] + (90,),
+    )
+    return {
+        "base": base.convert("RGB"),
+        "palette": palette,
+        "items": items,
+        "nframes": nframes,
+        "badge": _reference_badge(base.size, references, palette),
+        "line": (left, right, line_y),
+        "radius": radius,
+        "glow_width": max(8, width // 160),
+        "line_width": max(4, width // 210),
+        "item_xs": item_xs,
+        "reveals": [int(((idx + 1) / (len(items) + 1)) * nframes) for idx in range(len(items))],
+        "dim_accent": _mix(palette["accent"], palette["bg"][0], 0.55),
+        # Fonts don't survive pickling to frame workers; pass the size and use the _font cache.
+        "label_size": label_size,
+        "label_boxes": label_boxes,
+        "pulse": (pulse, 2 * radius + pad),
+    }
+
+
+def _timeline_frame(ctx: dict, frame_idx: int) -> Image.Image:
+    base, palette, items, nframes = ctx["base"], ctx["palette"], ctx["items"], ctx["nframes"]
+    left, right, line_y = ctx["line"]
+    radius = ctx["radius"]
+    pulse, pulse_offset = ctx["pulse"]
+
+    img = base.copy()
 
-    for frame_idx in range(nframes):
-        img = background.copy()
-        _draw_title(img, title, palette)
-
-        glow_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        glow_draw = ImageDraw.Draw(glow_layer)
-        glow_alpha = int(70 + 40 * (0.5 + 0.5 * math.sin(2 * math.pi * frame_idx / nframes)))
-        glow_draw.line((left, line_y, right, line_y), fill=palette["secondary"] + (glow_alpha,), width=max(8, width // 160))
-        glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=4))
-        img = Image.alpha_composite(img, glow_layer)
-
-        draw = ImageDraw.Draw(img)
-        draw.line((left, line_y, right, line_y), fill=palette["secondary"], width=max(4, width // 210))
-
-        for idx, label in enumerate(items):
-            reveal = int(((idx + 1) / (len(items) + 1)) * nframes)
-            x = int(left + idx * (right - left) / max(1, len(items) - 1))
-            base_color = palette["accent"] if frame_idx >= reveal else _mix(palette["accent"], palette["bg"][0], 0.55)
-
-            pulse_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-            pulse_draw = ImageDraw.Draw(pulse_layer)
-            pulse_draw.ellipse(
-                (x - radius * 2, line_y - radius * 2, x + radius * 2, line_y + radius * 2),
-                fill=palette["accent"] + (90,),
-            )
-            pulse_layer = pulse_layer.filter(ImageFilter.GaussianBlur(radius=4))
-            img = Image.alpha_composite(img, pulse_layer)
-
-        draw.ellipse((x - radius, line_y - radius, x + radius, line_y + radius), fill=base_color)
+    glow_alpha = int(70 + 40 * (0.5 + 0.5 * math.sin(2 * math.pi * frame_idx / nframes)))
+    _composite_blurred(
+        img, "line", (left, line_y, right, line_y), 4,
+        fill=palette["secondary"] + (glow_alpha,), width=ctx["glow_width"],
+    )
+
+    draw = ImageDraw.Draw(img)
+    draw.line((left, line_y, right, line_y), fill=palette["secondary"], width=ctx["line_width"])
+
+    label_font = _font(ctx["label_size"])
+    for label, x, reveal, (rect, text_xy) in zip(items, ctx["item_xs"], ctx["reveals"], ctx["label_boxes"]):
+        dot = (x - radius, line_y - radius, x + radius, line_y + radius)
+        if frame_idx < reveal:
+            # Not revealed yet: just a dim dot, no pulse or label.
+            draw.ellipse(dot, fill=ctx["dim_accent"])
+            continue
+
+        _composite_at(img, pulse, (x - pulse_offset, line_y - pulse_offset))
+        draw.ellipse(dot, fill=palette["accent"])
+        _composite_blurred(img, "rounded_rectangle", rect, 1, radius=14, fill=palette["primary"] + (235,))
+        draw.text(text_xy, label, fill=palette["neutral"], font=label_font)
 
-        if frame_idx >= reveal:
-            label_font = _font(max(24, width // 46))
-            tw, th = _measure_text(draw, label, label_font)
-            rect = (
-                x - tw // 2 - 16,
-                line_y - radius - th - 20,
-                x + tw // 2 + 16,
-                line_y - radius - 12,
-            )
-            tag_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-            tag_draw = ImageDraw.Draw(tag_layer)
-            tag_draw.rounded_rectangle(rect, radius=14, fill=palette["primary"] + (235,))
-            tag_layer = tag_layer.filter(ImageFilter.GaussianBlur(radius=1))
-            img = Image.alpha_composite(img, tag_layer)
-            draw.text((x - tw // 2, rect[1] + 4), label, fill=palette["neutral"], font=label_font)
-
-        img = _draw_reference_badge(img, references, palette)
-        frames.append(img.convert("RGB"))
-    return frames
-
-
-def _render_path(
+    if ctx["badge"]:
+        _composite_at(img, *ctx["badge"])
+    return img
+
+
+# Frames are built on an opaque RGB base (what the ffmpeg pipe takes), so RGBA overlays are
+# blended with paste(mask=alpha): the same "over" result as alpha_composite onto an opaque
+# image, without carrying an alpha channel or converting every frame.
+def _composite_at(img: Image.Image, layer: Image.Image, xy: Tuple[int, int]) -> None:
+    """Blend RGBA ``layer`` onto the RGB frame ``img`` in place at ``xy``, clipping at the edges."""
+    img.paste(layer, xy, layer)
+
+
+def _blur_margin(blur: int, width: int = 0) -> int:
+    # Padding around a shape's bounding box that holds its stroke and Gaussian falloff.
+    return width + 3 * blur + 2
+
+
+def _blurred_shape(size: Tuple[int, int], shape: str, xy, blur: int, **kwargs) -> Image.Image:
+    """A transparent RGBA layer of ``size`` with one ImageDraw ``shape`` drawn and blurred."""
+    layer = Image.new("RGBA", size, (0, 0, 0, 0))
+    getattr(ImageDraw.Draw(layer), shape)(xy, **kwargs)
+    return layer.filter(ImageFilter.GaussianBlur(radius=blur))
+
+
+def _composite_blurred(img: Image.Image, shape: str, xy, blur: int, **kwargs) -> None:
+    """Draw one ImageDraw ``shape`` soft-edged onto the RGB frame ``img`` in place.
+
+    Only the shape's bounding box (plus stroke and blur margin) is allocated and blurred,
+    rather than a full-frame layer.
+    """
+    points = list(xy) if isinstance(xy[0], tuple) else list(zip(xy[0::2], xy[1::2]))
+    margin = _blur_margin(blur, kwargs.get("width", 0))
+    x0 = max(0, int(min(p[0] for p in points)) - margin)
+    y0 = max(0, int(min(p[1] for p in points)) - margin)
+    x1 = min(img.width, int(max(p[0] for p in points)) + margin + 1)
+    y1 = min(img.height, int(max(p[1] for p in points)) + margin + 1)
+    if x0 >= x1 or y0 >= y1:
+        return
+    layer = _blurred_shape((x1 - x0, y1 - y0), shape, [(px - x0, py - y0) for px, py in points], blur, **kwargs)
+    _composite_at(img, layer, (x0, y0))
+
+
+def _ship_sprite(ship_size: int, palette: dict) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Pre-render the ship + flame once; returns the sprite and the ship nose anchor inside it."""
+    fin_height = int(ship_size / 1.7)
+    pad = 4
+    ox = ship_size + int(ship_size * 0.9) + pad
+    oy = fin_height + pad
+    sprite = Image.new("RGBA", (ox + ship_size + pad + 1, 2 * oy + 1), (0, 0, 0, 0))
+    ship_draw = ImageDraw.Draw(sprite)
+    ship = [
+        (ox + ship_size, oy),
+        (ox - ship_size, oy - fin_height),
+        (ox - ship_size, oy + fin_height),
+    ]
+    ship_draw.polygon(ship, fill=palette["accent"] + (245,))
+    flame = [
+        (ox - ship_size, oy - fin_height // 2),
+        (ox - ship_size - int(ship_size * 0.9), oy),
+        (ox - ship_size, oy + fin_height // 2),
+    ]
+    ship_draw.polygon(flame, fill=palette["primary"] + (220,))
+    sprite = sprite.filter(ImageFilter.GaussianBlur(radius=0.8))
+    return sprite, (ox, oy)
+
+
+def _bezier_weights(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Quadratic Bernstein basis, with plain products instead of ** 2.
+    one_m = 1 - t
+    return one_m * one_m, 2 * one_m * t, t * t
+
+
+def _prepare_path(
     background: Image.Image,
     palette: dict,
     title: str,
     nframes: int,
     star_field: Image.Image,
     references: List[str],
-) -> List[Image.Image]:
-    frames: List[Image.Image] = []
+) -> dict:
     width, height = background.size
     center_x, center_y = width // 2, height // 2
     hole_radius = int(min(width, height) * 0.09)
 
-    for frame_idx in range(nframes):
-        t = frame_idx / max(1, nframes - 1)
-        eased = 0.5 - 0.5 * math.cos(math.pi * t)
-        img = background.copy()
-        if star_field:
-            img = Image.alpha_composite(img, star_field)
-        _draw_title(img, title, palette)
-
-        target_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        target_draw = ImageDraw.Draw(target_layer)
-        rim = hole_radius * 2
-        target_draw.ellipse(
-            (center_x - rim, center_y - rim, center_x + rim, center_y + rim),
-            outline=palette["secondary"] + (220,),
-            width=max(4, width // 230),
-        )
-        target_draw.ellipse(
-            (center_x - hole_radius, center_y - hole_radius, center_x + hole_radius, center_y + hole_radius),
-            fill=(8, 12, 20, 255),
-        )
-        target_layer = target_layer.filter(ImageFilter.GaussianBlur(radius=2))
-        img = Image.alpha_composite(img, target_layer)
-
-        start_x = int(width * 0.1)
-        start_y = int(height * 0.8)
-        control_x = int(width * 0.55)
-        control_y = int(height * 0.35)
-
-        trail_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        trail_draw = ImageDraw.Draw(trail_layer)
-        steps = 120
-        path_points = []
-        for step in range(steps + 1):
-            tt = eased * (step / steps)
-            px = int((1 - tt) ** 2 * start_x + 2 * (1 - tt) * tt * control_x + tt ** 2 * center_x)
-            py = int((1 - tt) ** 2 * start_y + 2 * (1 - tt) * tt * control_y + tt ** 2 * center_y)
-            path_points.append((px, py))
-        if len(path_points) > 1:
-            trail_draw.line(path_points, fill=palette["secondary"] + (210,), width=max(6, width // 220))
-        trail_layer = trail_layer.filter(ImageFilter.GaussianBlur(radius=2))
-        img = Image.alpha_composite(img, trail_layer)
-
-        current_x, current_y = path_points[-1]
-        ship_layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        ship_draw = ImageDraw.Draw(ship_layer)
-        ship_size = max(18, width // 58)
-        fin_height = int(ship_size / 1.7)
-        ship = [
-            (current_x + ship_size, current_y),
-            (current_x - ship_size, current_y - fin_height),
-            (current_x - ship_size, current_y + fin_height),
-        ]
-        ship_draw.polygon(ship, fill=palette["accent"] + (245,))
-        flame = [
-            (current_x - ship_size, current_y - fin_height // 2),
-            (current_x - ship_size - int(ship_size * 0.9), current_y),
-            (current_x - ship_size, current_y + fin_height // 2),
-        ]
-        ship_draw.polygon(flame, fill=palette["primary"] + (220,))
-        ship_layer = ship_layer.filter(ImageFilter.GaussianBlur(radius=0.8))
-        img = Image.alpha_composite(img, ship_layer)
+    # Stars, title and the target rings never move; composite them once.
+    base = background.copy()
+    if star_field:
+        base = Image.alpha_composite(base, star_field)
+    _draw_title(base, title, palette)
+
+    target_layer = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    target_draw = ImageDraw.Draw(target_layer)
+    rim = hole_radius * 2
+    target_draw.ellipse(
+        (center_x - rim, center_y - rim, center_x + rim, center_y + rim),
+        outline=palette["secondary"] + (220,),
+        width=max(4, width // 230),
+    )
+    target_draw.ellipse(
+        (center_x - hole_radius, center_y - hole_radius, center_x + hole_radius, center_y + hole_radius),
+        fill=(8, 12, 20, 255),
+    )
+    target_layer = target_layer.filter(ImageFilter.GaussianBlur(radius=2))
+    base = Image.alpha_composite(base, target_layer)
+
+    start_x = int(width * 0.1)
+    start_y = int(height * 0.8)
+    control_x = int(width * 0.55)
+    control_y = int(height * 0.35)
+
+    # Ship position per frame is the Bezier point at the eased time; solve them all at once.
+    ts = np.arange(nframes, dtype=np.float64) / max(1, nframes - 1)
+    eased_all = 0.5 - 0.5 * np.cos(math.pi * ts)
+    b0, b1, b2 = _bezier_weights(eased_all)
+    ship_xs = (b0 * start_x + b1 * control_x + b2 * center_x).astype(np.int64)
+    ship_ys = (b0 * start_y + b1 * control_y + b2 * center_y).astype(np.int64)
+
+    ship_size = max(18, width // 58)
+    ship_sprite, ship_origin = _ship_sprite(ship_size, palette)
+    return {
+        "base": base.convert("RGB"),
+        "palette": palette,
+        "badge": _reference_badge(base.size, references, palette),
+        "curve": (start_x, start_y, control_x, control_y, center_x, center_y),
+        "eased": eased_all,
+        "ship_xs": ship_xs,
+        "ship_ys": ship_ys,
+        "ship_sprite": ship_sprite,
+        "ship_origin": ship_origin,
+        "trail_width": max(6, width // 220),
+        "trail_ts": np.arange(121) / 120,
+    }
+
+
+def _path_frame(ctx: dict, frame_idx: int) -> Image.Image:
+    base, palette = ctx["base"], ctx["palette"]
+    start_x, start_y, control_x, control_y, center_x, center_y = ctx["curve"]
+    ship_sprite, ship_origin = ctx["ship_sprite"], ctx["ship_origin"]
+
+    eased = float(ctx["eased"][frame_idx])
+    img = base.copy()
 
-        img = _draw_reference_badge(img, references, palette)
-        frames.append(img.convert("RGB"))
-    return frames
+    # Quadratic bezier from the start up to the ship's current position, sampled at 121 points.
+    b0, b1, b2 = _bezier_weights(eased * ctx["trail_ts"])
+    px = (b0 * start_x + b1 * control_x + b2 * center_x).astype(int)
+    py = (b0 * start_y + b1 * control_y + b2 * center_y).astype(int)
+    path_points = list(zip(px.tolist(), py.tolist()))
+    _composite_blurred(img, "line", path_points, 2, fill=palette["secondary"] + (210,), width=ctx["trail_width"])
 
+    current_x, current_y = int(ctx["ship_xs"][frame_idx]), int(ctx["ship_ys"][frame_idx])
+    _composite_at(img, ship_sprite, (current_x - ship_origin[0], current_y - ship_origin[1]))
 
-def _render_diagram(
+    if ctx["badge"]:
+        _composite_at(img, *ctx["badge"])
+    return img
+
+
+def _prepare_diagram(
     background: Image.Image,
     palette: dict,
     title: str,
     bullets: List[str],
     nframes: int,
     references: List[str],
-) -> List[Image.Image]:
-    frames: List[Image.Image] = []
+) -> dict:
     width, height = background.size
     margin = int(min(width, height) * 0.08)
     card_rect = (
@@ -439,8 +694,7 @@ def _render_diagram(
 
     top_color = _mix(palette["primary"], palette["neutral"], 0.35)
     bottom_color = _mix(palette["secondary"], palette["neutral"], 0.55)
-    card_base = _vertical_gradient((card_width, card_height), top_color, bottom_color).convert("RGBA")
-    card_base.putalpha(235)
+    card_base = _vertical_gradient((card_width, card_height), top_color, bottom_color, alpha=235)
 
     grid_layer = Image.new("RGBA", (card_width, card_height), (0, 0, 0, 0))
     grid_draw = ImageDraw.Draw(grid_layer)
@@ -452,76 +706,265 @@ def _render_diagram(
         grid_draw.line((0, gy, card_width, gy), fill=grid_color, width=1)
     grid_layer = grid_layer.filter(ImageFilter.GaussianBlur(radius=1))
 
-    for frame_idx in range(nframes):
-        img = background.copy()
-        _draw_title(img, title, palette)
-
-        shadow = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow)
-        shadow_draw.rounded_rectangle(card_rect, radius=card_radius, fill=(0, 0, 0, 80))
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=12))
-        img = Image.alpha_composite(img, shadow)
-
-        img.paste(card_base, (card_rect[0], card_rect[1]), card_base)
-
-        highlight = Image.new("RGBA", (card_width, card_height), (0, 0, 0, 0))
-        highlight_draw = ImageDraw.Draw(highlight)
-        pulse = 0.5 + 0.5 * math.sin(2 * math.pi * frame_idx / nframes)
-        hx = card_width // 2
-        hy = int(card_height * 0.35)
-        radius = int(card_width * (0.45 + 0.1 * pulse))
-        highlight_draw.ellipse(
-            (hx - radius, hy - radius, hx + radius, hy + radius),
-            fill=palette["neutral"] + (int(55 + 30 * pulse),),
-        )
-        highlight = highlight.filter(ImageFilter.GaussianBlur(radius=18))
-        img.paste(highlight, (card_rect[0], card_rect[1]), highlight)
+    # Title, card shadow and card gradient sit under the animated highlight; build them once.
+    base = background.copy()
+    _draw_title(base, title, palette)
+    shadow = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    shadow_draw = ImageDraw.Draw(shadow)
+    shadow_draw.rounded_rectangle(card_rect, radius=card_radius, fill=(0, 0, 0, 80))
+    shadow = shadow.filter(ImageFilter.GaussianBlur(radius=12))
+    base = Image.alpha_composite(base, shadow)
+    base.paste(card_base, (card_rect[0], card_rect[1]), card_base)
+
+    # Grid, bullet pills and the reference badge sit above the highlight but never change,
+    # so flatten them into one overlay instead of re-rasterizing text on every frame.
+    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    overlay.alpha_composite(grid_layer, (card_rect[0], card_rect[1]))
+    overlay = _draw_bullets(overlay, bullets, palette)
+    overlay = _draw_reference_badge(overlay, references, palette)
+    # The highlight never leaves the card, so everything outside it is the same every frame:
+    # pre-flatten base + overlay, and keep card-sized crops to recomposite per frame.
+    return {
+        "base": Image.alpha_composite(base, overlay).convert("RGB"),
+        "palette": palette,
+        "nframes": nframes,
+        "card_rect": card_rect,
+        # Not opaque: pasting card_base with itself as the mask also blends the alpha channel,
+        # so the card area of ``base`` carries alpha ~236. The overlay is alpha_composited
+        # against that alpha, so keep RGBA; converting to RGB first changes the card pixels.
+        "card_base": base.crop(card_rect),
+        "card_overlay": overlay.crop(card_rect),
+    }
 
-        img.paste(grid_layer, (card_rect[0], card_rect[1]), grid_layer)
-        img = _draw_bullets(img, bullets, palette)
-        img = _draw_reference_badge(img, references, palette)
-        frames.append(img.convert("RGB"))
-    return frames
 
+def _diagram_frame(ctx: dict, frame_idx: int) -> Image.Image:
+    base, palette, nframes = ctx["base"], ctx["palette"], ctx["nframes"]
+    card_rect = ctx["card_rect"]
+    card_width = card_rect[2] - card_rect[0]
+    card_height = card_rect[3] - card_rect[1]
 
-def render(
+    img = base.copy()
+    card = ctx["card_base"].copy()
+
+    highlight = _scratch((card_width, card_height))
+    highlight_draw = ImageDraw.Draw(highlight)
+    pulse = 0.5 + 0.5 * math.sin(2 * math.pi * frame_idx / nframes)
+    hx = card_width // 2
+    hy = int(card_height * 0.35)
+    radius = int(card_width * (0.45 + 0.1 * pulse))
+    highlight_draw.ellipse(
+        (hx - radius, hy - radius, hx + radius, hy + radius),
+        fill=palette["neutral"] + (int(55 + 30 * pulse),),
+    )
+    highlight = highlight.filter(ImageFilter.GaussianBlur(radius=18))
+    card.paste(highlight, (0, 0), highlight)
+    card.alpha_composite(ctx["card_overlay"])
+    img.paste(card, (card_rect[0], card_rect[1]))
+    return img
+
+
+# Frame rendering is a pure function of (ctx, frame_idx), so frames fan out to worker
+# processes. One pool per worker count is shared by every clip in this process, so
+# concurrent renders don't each spawn cpu_count workers. A clip's (frame_fn, ctx) is
+# pickled to a temp file once; workers load it on first use and keep the latest few.
+_FRAME_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_FRAME_POOLS_LOCK = threading.Lock()
+
+
+def _frame_pool(workers: int) -> ProcessPoolExecutor:
+    with _FRAME_POOLS_LOCK:
+        pool = _FRAME_POOLS.get(workers)
+        if pool is None:
+            # spawn, not fork: render() usually runs inside a threaded server process.
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _FRAME_POOLS[workers] = pool
+        return pool
+
+
+@functools.lru_cache(maxsize=4)
+def _load_frame_job(job_path: str):
+    with open(job_path, "rb") as fh:
+        return pickle.load(fh)
+
+
+def _render_frame_chunk(job_path: str, start: int, stop: int) -> List[bytes]:
+    frame_fn, ctx = _load_frame_job(job_path)
+    return [frame_fn(ctx, i).tobytes() for i in range(start, stop)]
+
+
+def _iter_frame_bytes(frame_fn, ctx: dict, nframes: int, workers: int) -> Iterator[bytes]:
+    """Yield raw RGB frames in order, rendering them across ``workers`` processes."""
+    if workers <= 1 or nframes <= FRAME_CHUNK:
+        for i in range(nframes):
+            yield frame_fn(ctx, i).tobytes()
+        return
+
+    pool = _frame_pool(workers)
+    fd, job_path = tempfile.mkstemp(prefix=f"anim_job_{uuid.uuid4().hex}_", suffix=".pkl")
+    with os.fdopen(fd, "wb") as fh:
+        pickle.dump((frame_fn, ctx), fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def submit(s: int):
+        return pool.submit(_render_frame_chunk, job_path, s, min(s + FRAME_CHUNK, nframes))
+
+    # Keep only a small window of chunks in flight so finished frames don't pile up
+    # in memory faster than ffmpeg can encode them.
+    starts = iter(range(0, nframes, FRAME_CHUNK))
+    pending = collections.deque()
+    try:
+        pending.extend(submit(s) for s in itertools.islice(starts, workers + 1))
+        while pending:
+            chunk = pending.popleft().result()
+            nxt = next(starts, None)
+            if nxt is not None:
+                pending.append(submit(nxt))
+            yield from chunk
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); drop the pool so the next clip gets a fresh one.
+        with _FRAME_POOLS_LOCK:
+            if _FRAME_POOLS.get(workers) is pool:
+                del _FRAME_POOLS[workers]
+        raise
+    finally:
+        for fut in pending:
+            fut.cancel()
+        _discard(job_path)
+
+
+def _prepare_clip(
     spec: dict,
-    duration_s: float = 6.0,
-    title: str = "",
-    bullets: Optional[List[str]] = None,
-    width: int = 1920,
-    height: int = 1080,
-    fps: int = FPS_DEFAULT,
-) -> str:
-    """Render a short MP4 clip with vibrant flat-vector styling."""
+    duration_s: float,
+    title: str,
+    bullets: Optional[List[str]],
+    width: int,
+    height: int,
+    fps: int,
+) -> Tuple[str, Callable[[dict, int], Image.Image], dict, int]:
+    """Build everything a clip needs up front: (out_path, frame_fn, ctx, nframes)."""
     bullets = bullets or []
     kind = (spec.get("diagram", {}) or {}).get("kind") or spec.get("kind") or "diagram"
     subject = spec.get("subject") or title or kind
     references = spec.get("references", []) or []
 
-    _ensure_dir(ANIM_OUT)
     out_path = os.path.join(ANIM_OUT, f"{kind}_{uuid.uuid4().hex}.mp4")
 
     nframes = max(1, int(fps * duration_s))
-    frames_dir = os.path.join(ANIM_OUT, f"frames_{uuid.uuid4().hex}")
-    _ensure_dir(frames_dir)
 
     seed_key = subject or f"{title or kind}-{kind}"
-    seed_value = int(hashlib.sha1(seed_key.encode("utf-8")).hexdigest(), 16)
+    seed_value = _seed_int(seed_key)
     palette = _palette_for(seed_key)
     background = _build_background(width, height, palette, random.Random(seed_value ^ 0x1234))
     background = _apply_background_image(background, width, height, palette, spec.get("background_image"))
 
     if kind == "timeline":
         items = spec.get("items", ["Act I", "Act II", "Act III"])
-        frames = _render_timeline(background, palette, title, items, nframes, references)
+        ctx = _prepare_timeline(background, palette, title, items, nframes, references)
+        frame_fn = _timeline_frame
     elif kind == "path":
         star_layer = _make_star_field(width, height, random.Random(seed_value ^ 0x9ABC), palette)
-        frames = _render_path(background, palette, title, nframes, star_layer, references)
+        ctx = _prepare_path(background, palette, title, nframes, star_layer, references)
+        frame_fn = _path_frame
     else:
-        frames = _render_diagram(background, palette, title, bullets, nframes, references)
+        ctx = _prepare_diagram(background, palette, title, bullets, nframes, references)
+        frame_fn = _diagram_frame
+    return out_path, frame_fn, ctx, nframes
+
+
+def render(
+    spec: dict,
+    duration_s: float = 6.0,
+    title: str = "",
+    bullets: Optional[List[str]] = None,
+    width: int = 1920,
+    height: int = 1080,
+    fps: int = FPS_DEFAULT,
+    preset: str = "veryfast",
+    tune: Optional[str] = "stillimage",
+    workers: Optional[int] = None,
+) -> str:
+    """Render a short MP4 clip with vibrant flat-vector styling.
+
+    ``preset``/``tune`` are passed to libx264; use ``preset="ultrafast"`` for drafts.
+    GPU encoders (see ``_video_encoder``) ignore them.
+    ``workers`` is the number of frame-rendering processes (default ``ANIM_WORKERS``).
+    Blocks until the clip is encoded; use ``render_async`` from async code.
+    """
+    out_path, frame_fn, ctx, nframes = _prepare_clip(spec, duration_s, title, bullets, width, height, fps)
+    # Stream raw frames straight into the encoder; no intermediate PNGs on disk.
+    cmd = _ffmpeg_cmd(width, height, fps, out_path, preset=preset, tune=tune)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=0)
+    frames = _iter_frame_bytes(frame_fn, ctx, nframes, ANIM_WORKERS if workers is None else workers)
+    try:
+        for frame in frames:
+            proc.stdin.write(frame)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its return code below reports the failure
+    except BaseException:
+        # A frame failed to render: don't leave ffmpeg waiting on stdin or a truncated file.
+        proc.kill()
+        proc.wait()
+        _discard(out_path)
+        raise
+    finally:
+        # Cancel chunks still queued in the shared frame pool now rather than at GC.
+        frames.close()
+    if proc.wait() != 0:
+        _discard(out_path)
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return out_path
 
-    for idx, frame in enumerate(frames):
-        frame.save(os.path.join(frames_dir, f"{idx:06d}.png"))
 
-    return _encode_frames_to_mp4(frames_dir, fps, out_path)
+async def render_async(
+    spec: dict,
+    duration_s: float = 6.0,
+    title: str = "",
+    bullets: Optional[List[str]] = None,
+    width: int = 1920,
+    height: int = 1080,
+    fps: int = FPS_DEFAULT,
+    preset: str = "veryfast",
+    tune: Optional[str] = "stillimage",
+    workers: Optional[int] = None,
+) -> str:
+    """Async variant of ``render`` that never blocks the event loop.
+
+    Frame preparation and drawing run in a worker thread (or the frame process pool),
+    and frames are piped to an asyncio ffmpeg subprocess with ``drain()`` backpressure.
+    """
+    out_path, frame_fn, ctx, nframes = await asyncio.to_thread(
+        _prepare_clip, spec, duration_s, title, bullets, width, height, fps
+    )
+    cmd = await asyncio.to_thread(_ffmpeg_cmd, width, height, fps, out_path, preset, tune)
+    proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE)
+
+    frames = _iter_frame_bytes(frame_fn, ctx, nframes, ANIM_WORKERS if workers is None else workers)
+    step = None  # the in-flight next(frames); the generator can't be closed while it runs
+    try:
+        while True:
+            step = asyncio.ensure_future(asyncio.to_thread(next, frames, None))
+            frame = await asyncio.shield(step)
+            if frame is None:
+                break
+            proc.stdin.write(frame)
+            await proc.stdin.drain()
+        proc.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # ffmpeg exited early; its return code below reports the failure
+    except BaseException:
+        # Render error or cancellation: stop ffmpeg and drop the partial clip.
+        proc.kill()
+        await proc.wait()
+        _discard(out_path)
+        raise
+    finally:
+        if step is not None and not step.done():
+            await asyncio.wait([step])
+        if step is not None and not step.cancelled():
+            step.exception()  # already surfaced above if it mattered
+        # Cancel chunks still queued in the shared frame pool now rather than at GC.
+        frames.close()
+    if await proc.wait() != 0:
+        _discard(out_path)
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return out_path
@@ -1,33 +1,274 @@
-﻿import json
-import re
+﻿import copy
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-
-# Choose a size that fits your box; switch to 7B on a 24GB GPU.
-MODEL = "Qwen/Qwen2.5-1.5B-Instruct"
+from transformers import AutoModelForCausalLM, AutoTokenizer, StoppingCriteria, StoppingCriteriaList
+
+# Choose a size that fits your box; switch to 7B on a 24GB GPU. For a 7B on a smaller GPU use a
+# pre-quantized AWQ/GPTQ checkpoint (e.g. Qwen/Qwen2.5-7B-Instruct-AWQ): transformers loads it
+# directly and decodes faster at batch 1 than bitsandbytes 4-bit.
+MODEL = os.getenv("LEARNGEN_LLM_MODEL", "Qwen/Qwen2.5-1.5B-Instruct")
+
+# Serving backend: "hf" (transformers generate), "vllm" (CUDA), or "llamacpp" (GGUF quant on CPU).
+# Without a GPU the default is llama.cpp: CPU decode is memory-bound, and Q4_K_M moves ~8x fewer
+# bytes per token than the fp32 transformers path.
+LLM_BACKEND = (
+    os.getenv("LEARNGEN_LLM_BACKEND", "").strip().lower()
+    or ("hf" if torch.cuda.is_available() else "llamacpp")
+)
+LLM_QUANT = os.getenv("LEARNGEN_LLM_QUANT") or None  # vLLM quantization, e.g. "awq" with an AWQ checkpoint
+# A local GGUF path, or a file name fetched from GGUF_REPO when no such file exists. Both
+# default to MODEL's Q4_K_M quant (Qwen's "<model>-GGUF" naming), so the weights always match
+# the tokenizer, which llama.cpp plans still load from MODEL.
+LLM_GGUF = os.getenv("LEARNGEN_LLM_GGUF") or MODEL.rsplit("/", 1)[-1].lower() + "-q4_k_m.gguf"
+GGUF_REPO = os.getenv("LEARNGEN_LLM_GGUF_REPO") or f"{MODEL}-GGUF"
+# Static KV cache + torch.compile of the forward on CUDA; the first plan pays a long compile, so it's opt-in.
+COMPILE_DECODE = os.getenv("LEARNGEN_LLM_COMPILE") == "1"
+# 2 or 4: keep the KV cache quantized (optimum-quanto) to cut the bytes read per decode step on
+# long prompts. Off by default; at short contexts the dequantize costs more than it saves.
+KV_CACHE_BITS = int(os.getenv("LEARNGEN_LLM_KV_BITS", "0"))
+# Small same-tokenizer model (e.g. Qwen/Qwen2.5-0.5B-Instruct) for speculative decoding on the
+# transformers backend. Schema-heavy JSON is mostly punctuation and keys the draft gets right.
+DRAFT_MODEL = os.getenv("LEARNGEN_LLM_DRAFT_MODEL") or None
+# vLLM KV cache dtype: "auto" picks FP8 on GPUs with native FP8 (Ada/Hopper, sm_89+) and the
+# model dtype elsewhere; "fp8" forces FP8, "model" always keeps the model dtype.
+KV_CACHE_DTYPE = os.getenv("LEARNGEN_LLM_KV_DTYPE", "auto").strip().lower()
 
 _tok = None
 _mdl = None
+_assistant = None  # loaded DRAFT_MODEL, if any
+_load_lock = threading.Lock()
+_sys_prefix = None  # (input_ids, past_key_values) for the constant system-prompt turn
+_json_enforcer = None  # lm-format-enforcer tokenizer data, built once per tokenizer
+_gguf_grammar = None  # llama.cpp grammar for PLAN_SCHEMA
+
+
+def _attn_implementation(use_cuda: bool) -> str:
+    # FlashAttention-2 needs Ampere+ and the flash-attn package, and transformers won't pair
+    # it with the static cache; PyTorch SDPA covers everything else.
+    if (
+        use_cuda
+        and not COMPILE_DECODE
+        and torch.cuda.get_device_capability()[0] >= 8
+        and importlib.util.find_spec("flash_attn") is not None
+    ):
+        return "flash_attention_2"
+    return "sdpa"
+
+
+def _cpu_dtype():
+    # CPUs with AVX512-BF16 or AMX run bf16 GEMMs natively; decode is memory-bound, so halving
+    # the weight bytes is the main win. Elsewhere bf16 is emulated and slower than fp32.
+    for probe in ("_is_avx512_bf16_supported", "_is_amx_tile_supported"):
+        check = getattr(torch.cpu, probe, None)
+        if check is not None and check():
+            return torch.bfloat16
+    return torch.float32
 
 
 def _safe_device_kwargs():
     use_cuda = torch.cuda.is_available()
     return {
         "device_map": "auto" if use_cuda else "cpu",
-        "torch_dtype": torch.float16 if use_cuda else torch.float32,
+        "torch_dtype": torch.float16 if use_cuda else _cpu_dtype(),
+        "attn_implementation": _attn_implementation(use_cuda),
         "low_cpu_mem_usage": True,
     }
 
 
 def _load():
-    global _tok, _mdl
+    global _tok, _mdl, _assistant
     if _mdl is not None:
         return _tok, _mdl
-    _tok = AutoTokenizer.from_pretrained(MODEL, use_fast=True)
-    _mdl = AutoModelForCausalLM.from_pretrained(MODEL, **_safe_device_kwargs())
+    # Plans are produced from worker threads; without the lock, concurrent first requests
+    # would each load their own copy of the weights.
+    with _load_lock:
+        if _mdl is None:
+            tok, mdl = _load_model()
+            if DRAFT_MODEL and LLM_BACKEND == "hf":
+                _assistant = AutoModelForCausalLM.from_pretrained(DRAFT_MODEL, **_safe_device_kwargs())
+            _tok, _mdl = tok, mdl
     return _tok, _mdl
 
 
+def _load_model():
+    if LLM_BACKEND == "vllm":
+        from vllm import LLM
+        # Ada/Hopper have native FP8: store the KV cache in it to halve decode's KV reads.
+        if KV_CACHE_DTYPE == "auto":
+            kv_dtype = "fp8" if torch.cuda.get_device_capability() >= (8, 9) else "auto"
+        else:
+            kv_dtype = "fp8" if KV_CACHE_DTYPE == "fp8" else "auto"
+        mdl = LLM(model=MODEL, dtype="float16", quantization=LLM_QUANT, kv_cache_dtype=kv_dtype)
+        return mdl.get_tokenizer(), mdl
+    # The HF tokenizer still renders the chat template for the llama.cpp backend.
+    tok = AutoTokenizer.from_pretrained(MODEL, use_fast=True)
+    if LLM_BACKEND == "llamacpp":
+        from llama_cpp import Llama
+        model_path = LLM_GGUF
+        if not os.path.exists(model_path):
+            from huggingface_hub import hf_hub_download
+            try:
+                model_path = hf_hub_download(GGUF_REPO, LLM_GGUF)
+            except Exception as exc:
+                raise RuntimeError(
+                    f"No GGUF quant {LLM_GGUF!r} in {GGUF_REPO!r} for LEARNGEN_LLM_MODEL={MODEL!r}. "
+                    "Set LEARNGEN_LLM_GGUF (a local path or file name) and LEARNGEN_LLM_GGUF_REPO to a "
+                    "quant of the same model, or LEARNGEN_LLM_BACKEND=hf."
+                ) from exc
+        return tok, Llama(model_path=model_path, n_ctx=4096, n_threads=os.cpu_count(), verbose=False)
+    mdl = AutoModelForCausalLM.from_pretrained(MODEL, **_safe_device_kwargs())
+    if COMPILE_DECODE and torch.cuda.is_available():
+        # generate() allocates the StaticCache once and resets it between calls, so decode
+        # steps keep fixed shapes and replay as CUDA graphs.
+        mdl.generation_config.cache_implementation = "static"
+        mdl.forward = torch.compile(mdl.forward, mode="reduce-overhead", fullgraph=False)
+        # Pay for compilation and graph capture here rather than on the first request: the
+        # first call compiles prefill and decode, the second records the CUDA graphs.
+        warmup = tok("Warm up.", return_tensors="pt").to(mdl.device)
+        for _ in range(2):
+            mdl.generate(**warmup, max_new_tokens=4, do_sample=False, pad_token_id=tok.eos_token_id)
+    return tok, mdl
+
+
+def _system_prefix(tok, mdl):
+    # Every prompt starts with the same system turn (instructions + JSON shape); prefill it
+    # once and reuse its KV cache.
+    global _sys_prefix
+    if _sys_prefix is None:
+        ids = tok.apply_chat_template(
+            [{"role": "system", "content": SYSTEM_PROMPT}], return_tensors="pt"
+        ).to(mdl.device)
+        with torch.no_grad():
+            kv = mdl(ids, use_cache=True).past_key_values
+        _sys_prefix = (ids, kv)
+    return _sys_prefix
+
+
+def _plan_enforcer(tok):
+    global _json_enforcer
+    if _json_enforcer is None:
+        from lmformatenforcer.integrations.transformers import build_token_enforcer_tokenizer_data
+        _json_enforcer = build_token_enforcer_tokenizer_data(tok)
+    return _json_enforcer
+
+
+def _plan_grammar():
+    global _gguf_grammar
+    if _gguf_grammar is None:
+        from llama_cpp import LlamaGrammar
+        _gguf_grammar = LlamaGrammar.from_json_schema(orjson.dumps(PLAN_SCHEMA).decode(), verbose=False)
+    return _gguf_grammar
+
+
+class _JsonObjectStop(StoppingCriteria):
+    """Stop as soon as the generated text closes its top-level JSON object.
+
+    Tracks brace depth incrementally over each step's new tokens, skipping braces inside
+    strings, so nothing after the closing brace costs another forward pass.
+    """
+
+    def __init__(self, tok, prompt_len: int):
+        self.tok = tok
+        self.seen = prompt_len
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.done = False
+
+    def _feed(self, text: str) -> None:
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    self.done = True
+                    return
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if not self.done:
+            self._feed(self.tok.decode(input_ids[0, self.seen:], skip_special_tokens=True))
+            self.seen = input_ids.shape[-1]
+        return torch.full((input_ids.shape[0],), self.done, dtype=torch.bool, device=input_ids.device)
+
+
+def _generate(tok, mdl, messages: list, max_new_tokens: int) -> str:
+    """Greedy-decode a reply to chat ``messages`` as plan JSON; return only the generated text.
+
+    Every backend constrains decoding to PLAN_SCHEMA (lm-format-enforcer for transformers,
+    guided decoding for vLLM, a GBNF grammar for llama.cpp), so the output parses as-is
+    unless it hits ``max_new_tokens``.
+    """
+    if LLM_BACKEND in ("vllm", "llamacpp"):
+        # These take the rendered prompt text and tokenize it themselves.
+        prompt = tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    if LLM_BACKEND == "vllm":
+        from vllm import SamplingParams
+        from vllm.sampling_params import GuidedDecodingParams
+        params = SamplingParams(
+            temperature=0.0, max_tokens=max_new_tokens, guided_decoding=GuidedDecodingParams(json=PLAN_SCHEMA)
+        )
+        return mdl.generate([prompt], params, use_tqdm=False)[0].outputs[0].text
+    if LLM_BACKEND == "llamacpp":
+        out = mdl(prompt, max_tokens=max_new_tokens, temperature=0.0, grammar=_plan_grammar())
+        return out["choices"][0]["text"]
+
+    # Render and encode in one call, without an intermediate prompt string round-trip.
+    inputs = tok.apply_chat_template(
+        messages, add_generation_prompt=True, return_dict=True, return_tensors="pt"
+    ).to(mdl.device)
+    ids = inputs["input_ids"]
+    extra = {}
+    # generate() won't take a prefilled dynamic cache alongside a static or quantized one.
+    if mdl.generation_config.cache_implementation == "static":
+        pass
+    elif KV_CACHE_BITS:
+        extra["cache_implementation"] = "quantized"
+        extra["cache_config"] = {"backend": "quanto", "nbits": KV_CACHE_BITS, "compute_dtype": mdl.dtype}
+    else:
+        prefix_ids, prefix_kv = _system_prefix(tok, mdl)
+        n = prefix_ids.shape[-1]
+        if ids.shape[-1] > n and torch.equal(ids[:, :n], prefix_ids):
+            # generate() only prefills the tokens past the cached prefix; copy because it
+            # extends the cache in place.
+            extra["past_key_values"] = copy.deepcopy(prefix_kv)
+        if _assistant is not None:
+            # Greedy assisted decoding: output is identical, the draft only proposes tokens.
+            extra["assistant_model"] = _assistant
+    from lmformatenforcer import JsonSchemaParser
+    from lmformatenforcer.integrations.transformers import build_transformers_prefix_allowed_tokens_fn
+    allowed_tokens = build_transformers_prefix_allowed_tokens_fn(_plan_enforcer(tok), JsonSchemaParser(PLAN_SCHEMA))
+    out = mdl.generate(
+        **inputs,
+        max_new_tokens=max_new_tokens,
+        do_sample=False,   # greedy, deterministic JSON
+        num_beams=1,
+        use_cache=True,
+        eos_token_id=tok.eos_token_id,
+        pad_token_id=tok.eos_token_id,
+        prefix_allowed_tokens_fn=allowed_tokens,
+        stopping_criteria=StoppingCriteriaList([_JsonObjectStop(tok, ids.shape[-1])]),
+        **extra,
+    )
+    generated = out[0][ids.shape[-1]:]
+    if generated.numel() == 0:
+        return ""
+    return tok.decode(generated, skip_special_tokens=True)
+
+
 # ---------------------- Prompting ----------------------
 
 SYS = (
@@ -73,6 +314,71 @@ Constraints: max 2 sentences per beat; include a pattern break roughly every 15-
 """
 
 
+def _nullable(schema: dict) -> dict:
+    return {"anyOf": [schema, {"type": "null"}]}
+
+
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+
+# The static instructions and schema go in the system turn, ahead of anything per-request,
+# so the whole block is a cacheable prompt prefix (see _system_prefix).
+SYSTEM_PROMPT = SYS + "\n\n" + JSON_SHAPE
+
+# JSON_SHAPE as a JSON schema, for constrained decoding.
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "topic": {"type": "string"},
+        "length_min": {"type": "number"},
+        "narration_full": {"type": "string"},
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "goal": {"type": "string"},
+                    "beats": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "type": {"type": "string", "enum": ["layout", "diagram", "timeline", "anim_path"]},
+                                "narration": {"type": "string"},
+                                "onscreen": {
+                                    "type": "object",
+                                    "properties": {
+                                        "title": _nullable({"type": "string"}),
+                                        "bullets": _STRINGS,
+                                        "diagram": _nullable({"type": "object"}),
+                                        "anim_path": _nullable({"type": "object"}),
+                                        "assets": {
+                                            "type": "object",
+                                            "properties": {
+                                                "need_image": {"type": "boolean"},
+                                                "style": {"type": "string"},
+                                                "subject": _nullable({"type": "string"}),
+                                                "reference_terms": _STRINGS,
+                                            },
+                                            "required": ["need_image", "style", "subject", "reference_terms"],
+                                        },
+                                    },
+                                    "required": ["title", "bullets", "diagram", "anim_path", "assets"],
+                                },
+                                "duration_s": {"type": "number"},
+                            },
+                            "required": ["type", "narration", "onscreen", "duration_s"],
+                        },
+                    },
+                },
+                "required": ["id", "goal", "beats"],
+            },
+        },
+    },
+    "required": ["topic", "length_min", "narration_full", "sections"],
+}
+
+
 # ---------------------- (Optional) RAG / web search ----------------------
 
 def _maybe_build_context(topic, cfg):
@@ -91,8 +397,7 @@ def _maybe_build_context(topic, cfg):
     if not bundle or not bundle.get("chunks"):
         return None
 
-    lines = [f"[{ch['source_id']}] {ch['text']}" for ch in bundle["chunks"]]
-    ctx = "\n".join(lines)
+    ctx = "\n".join(f"[{ch['source_id']}] {ch['text']}" for ch in bundle["chunks"])
     return {"context": ctx, "sources": bundle.get("sources", [])}
 
 
@@ -112,95 +417,41 @@ def _draft_plan(topic, beats, words, cfg, tok, mdl, context_block=None):
             f"Beats target: {beats}\n"
             "Use this verified context; prefer its facts and add inline [S#] where appropriate:\n"
             f"{safe_ctx}\n\n"
-            "Return ONLY the JSON object in the exact shape below:\n"
-            + JSON_SHAPE
+            "Return ONLY the JSON object in the exact shape given above."
         )
     else:
         user = (
             f"Topic: {topic}\n"
             f"Words target: {words}\n"
             f"Beats target: {beats}\n"
-            "Return ONLY the JSON object in the exact shape below:\n"
-            + JSON_SHAPE
+            "Return ONLY the JSON object in the exact shape given above."
         )
 
-    prompt = tok.apply_chat_template(
-        [{"role": "system", "content": SYS}, {"role": "user", "content": user}],
-        tokenize=False,
-    )
-
-    inputs = tok(prompt, return_tensors="pt").to(mdl.device)
-    out = mdl.generate(
-        **inputs,
-        max_new_tokens=1000,
-        temperature=0.2,   # low temp, deterministic JSON
-        do_sample=False,   # greedy
-        eos_token_id=tok.eos_token_id,
-    )
-    prompt_len = inputs["input_ids"].shape[-1]
-    generated = out[0][prompt_len:]
-    if generated.numel() == 0:
-        return ""
-    return tok.decode(generated, skip_special_tokens=True)
-
-
-# ---------------------- JSON repair helpers ----------------------
-
-def _find_json_span(s: str) -> str | None:
-    start = s.find("{")
-    end = s.rfind("}")
-    if start == -1 or end == -1 or end <= start:
-        return None
-    return s[start : end + 1]
-
-
-def _light_repair(s: str) -> str:
-    s = s.replace("\u201c", '"').replace("\u201d", '"').replace("\u2019", "'")
-    s = s.replace("```json", "").replace("```", "")
-    s = re.sub(r",(\s*[\]\}])", r"\1", s)  # trailing commas
-    return s
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user}]
+    return _generate(tok, mdl, messages, max_new_tokens=1000)
 
 
 def _extract_json(text: str) -> dict:
-    raw = _find_json_span(text)
-    if raw is None:
-        raise ValueError("Model did not return JSON text.")
+    # Decoding is schema-constrained, so the only way to get here with bad JSON is truncation.
     try:
-        return json.loads(raw)
-    except Exception:
-        fixed = _light_repair(raw)
-        return json.loads(fixed)
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as exc:
+        raise ValueError("Model output is not complete plan JSON (hit max_new_tokens?).") from exc
 
 
 # ---------------------- Public API ----------------------
 
 def produce_plan(topic, beats, words, cfg):
-    tok, mdl = _load()
-
-    ctx_block = _maybe_build_context(topic, cfg)
+    # Research fetches are network-bound and independent of the model, so run them while
+    # the model loads (first call) instead of after it.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ctx_future = pool.submit(_maybe_build_context, topic, cfg)
+        tok, mdl = _load()
+        ctx_block = ctx_future.result()
 
     txt = _draft_plan(topic, beats, words, cfg, tok, mdl, context_block=ctx_block)
 
-    try:
-        plan = _extract_json(txt)
-    except Exception:
-        reminder = (
-            "Return ONLY the JSON object. No extra text. "
-            "If you added anything else, remove it and output just the JSON."
-        )
-        strict_prompt = tok.apply_chat_template(
-            [{"role": "system", "content": SYS}, {"role": "user", "content": reminder}],
-            tokenize=False,
-        )
-        out2 = mdl.generate(
-            **tok(strict_prompt, return_tensors="pt").to(mdl.device),
-            max_new_tokens=200,
-            temperature=0.1,
-            do_sample=False,
-            eos_token_id=tok.eos_token_id,
-        )
-        txt2 = tok.decode(out2[0], skip_special_tokens=True)
-        plan = _extract_json(txt2)
+    plan = _extract_json(txt)
 
     plan["length_min"] = cfg.length.value
     if ctx_block and ctx_block.get("sources"):
@@ -1,15 +1,31 @@
-import json
+import asyncio
+import hashlib
 import logging
 import os
+import struct
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
+import orjson
 import soundfile as sf
 
 from . import anim, captions, llm, render, tts
+from ._cache import cache_entry, cache_key, cached_path, cached_path_async, store, temp_path
 
 DEBUG_DIR = "data/debug"
 LOGGER = logging.getLogger(__name__)
+
+# Beat clips render concurrently, up to this many at once. They share anim's frame-process
+# pool, so the overlap is mostly ffmpeg encoding and per-clip setup; diffusion stays serial.
+CLIP_CONCURRENCY = int(os.getenv("LEARNGEN_CLIP_CONCURRENCY", "0")) or min(4, os.cpu_count() or 1)
+
+
+def _beat_subject(cfg, sec, b) -> Tuple[str, str, List[str]]:
+    """(title, subject, reference terms) a beat is about."""
+    ons = b.get("onscreen", {}) or {}
+    assets = ons.get("assets", {}) or {}
+    title = ons.get("title") or sec.get("id") or cfg.topic
+    return title, assets.get("subject") or title, assets.get("reference_terms") or []
 
 
 def _flatten_beats(plan) -> List[tuple]:
@@ -58,6 +74,53 @@ def _should_ignore_narration(narration: str) -> bool:
     return False
 
 
+def _stable_seed(*parts) -> int:
+    """Seed derived from ``parts`` that is identical across processes (unlike ``hash()``)."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % 1_000_000
+
+
+class _UncachedPlan(Exception):
+    """Carries a plan out of the cache producer without storing it."""
+
+    def __init__(self, plan: dict):
+        super().__init__("plan not cached")
+        self.plan = plan
+
+
+def _produce_plan(cfg, beats_target: int, words: int) -> dict:
+    """``llm.produce_plan``, reusing the stored plan when the same inputs were planned before.
+
+    Decoding is greedy, so a re-run would only repeat the same plan; ``cfg.reuse_plan=False``
+    forces a fresh one (e.g. after the research sources changed online).
+    """
+    research = cfg.research
+    key = cache_key(
+        topic=cfg.topic,
+        beats=beats_target,
+        words=words,
+        length=cfg.length.value,
+        web_search=getattr(research, "web_search", False),
+        sources=list(getattr(research, "sources", []) or []),
+        backend=llm.LLM_BACKEND,
+        model=llm.LLM_GGUF if llm.LLM_BACKEND == "llamacpp" else llm.MODEL,
+        prompt=llm.SYSTEM_PROMPT,
+    )
+
+    def produce(out: str) -> None:
+        plan = llm.produce_plan(cfg.topic, beats_target, words, cfg)
+        if _should_ignore_narration((plan.get("narration_full") or "").strip()):
+            # run() rejects this plan; don't let it answer every later identical request.
+            raise _UncachedPlan(plan)
+        Path(out).write_bytes(orjson.dumps(plan))
+
+    try:
+        path = cached_path("plan", key, produce, ".json", force=not getattr(cfg, "reuse_plan", True))
+    except _UncachedPlan as exc:
+        return exc.plan
+    return orjson.loads(Path(path).read_bytes())
+
+
 def _image_mode(cfg) -> str:
     try:
         mode = getattr(cfg.visuals, "use_generated_images", "none")
@@ -82,10 +145,13 @@ def _build_image_prompt(topic: str, subject: str, references: List[str], narrati
 
 
 async def run(cfg):
+    # Every engine call below blocks (LLM, Piper, Whisper, diffusion, Pillow + ffmpeg),
+    # so each one runs in a worker thread (anim clips via anim.render_async) to keep the
+    # event loop serving other requests.
     words = cfg.length.value * cfg.voice.pace_wpm
     beats_target = cfg.length.value * cfg.structure.beats_per_min
 
-    plan = llm.produce_plan(cfg.topic, beats_target, words, cfg)
+    plan = await asyncio.to_thread(_produce_plan, cfg, beats_target, words)
     LOGGER.info(
         "Drafted plan for topic '%s' (%d sections, %d beats)",
         cfg.topic,
@@ -95,17 +161,167 @@ async def run(cfg):
 
     try:
         Path(DEBUG_DIR).mkdir(parents=True, exist_ok=True)
-        with open(Path(DEBUG_DIR) / "latest_plan.json", "w", encoding="utf-8") as f:
-            json.dump(plan, f, ensure_ascii=False, indent=2)
+        (Path(DEBUG_DIR) / "latest_plan.json").write_bytes(orjson.dumps(plan, option=orjson.OPT_INDENT_2))
     except Exception:
         pass
 
+    # 1) Voice + captions. Neither depends on the visuals, so they run in the background:
+    #    TTS overlaps image-pipeline loading and generation, captions overlap clip rendering.
+    narration_raw = (plan.get("narration_full") or "").strip()
+    if _should_ignore_narration(narration_raw):
+        LOGGER.error(
+            "Narration from plan is invalid (topic=%s, words=%d).",
+            cfg.topic,
+            len(narration_raw.split()),
+        )
+        composed = _compose_narration(plan)
+        if composed:
+            LOGGER.error("Composed narration fallback generated %d words but fallback usage is disabled.", len(composed.split()))
+        raise ValueError("Narration invalid or too short; aborting render.")
+    narration = narration_raw
+    voice = asyncio.ensure_future(_voice(narration, cfg))
+    subtitles = asyncio.ensure_future(_subtitles(voice))
+
     # --- dimensions & fps from config ---
     aspect = getattr(cfg.visuals, "aspect", "landscape")
     target_h = getattr(cfg.visuals, "target_height", 1080)
     W, H = _dims(aspect, target_h)
     FPS = getattr(cfg.visuals, "fps", 30)
 
+    try:
+        clips = await _render_clips(plan, cfg, narration, voice, W, H, FPS)
+        wav, _ = await voice
+        srt = await subtitles
+
+        # 3) Compose final (concat -> add VO + subs) -- compose will also guard empty lists
+        out_name = f"{cfg.topic[:48].replace(' ', '_')}.mp4"
+        mp4 = await asyncio.to_thread(
+            render.compose,
+            clips,
+            wav,
+            srt,
+            fps=FPS,
+            out_name=out_name,
+            burn_subtitles=getattr(cfg.visuals, "burn_subtitles", False),
+        )
+    except BaseException:
+        voice.cancel()
+        subtitles.cancel()
+        await asyncio.gather(voice, subtitles, return_exceptions=True)
+        raise
+
+    return {
+        "plan": plan,
+        "assets": {"clips": clips, "wav": wav, "srt": srt},
+        "final_mp4": mp4,
+    }
+
+
+def _wav_duration(path: str) -> float:
+    """Duration of a PCM WAV from its RIFF header; other formats go through libsndfile."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            byte_rate = 0
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    byte_rate = struct.unpack("<HHII", f.read(12))[3]
+                    f.seek(size - 12 + (size & 1), os.SEEK_CUR)
+                elif chunk_id == b"data" and byte_rate:
+                    return size / byte_rate
+                else:
+                    f.seek(size + (size & 1), os.SEEK_CUR)
+    return sf.info(path).duration
+
+
+async def _voice(narration: str, cfg) -> Tuple[str, float]:
+    """Synthesize the narration; returns the wav path and its duration in seconds."""
+    speaker = cfg.voice.speaker
+    wav = await asyncio.to_thread(
+        cached_path,
+        "tts",
+        cache_key(text=narration, speaker=speaker),
+        lambda out: tts.synthesize_to(narration, speaker, out),
+        ".wav",
+    )
+    try:
+        dur_s = _wav_duration(wav)
+    except FileNotFoundError:
+        dur_s = cfg.length.value * 60
+    return wav, dur_s
+
+
+async def _subtitles(voice: "asyncio.Future[Tuple[str, float]]") -> str:
+    wav, _ = await voice
+    return await asyncio.to_thread(captions.to_srt, wav)
+
+
+def _render_backgrounds(image_engine, pipe, requests: List[tuple], size: int) -> Dict[int, str]:
+    """Background image per beat index for ``requests`` of (index, prompt, seed).
+
+    Cached images are reused; the rest are generated together with ``render_batch``.
+    If generation fails, those beats get no background.
+    """
+    paths, misses = {}, []
+    for idx, prompt, seed in requests:
+        # render_batch seeds image i with seed + index; key on what the generator sees.
+        entry = cache_entry("images", cache_key(prompt=prompt, seed=seed + idx, size=size, steps=image_engine.STEPS), ".png")
+        if os.path.exists(entry):
+            paths[idx] = entry
+        else:
+            misses.append((idx, prompt, seed, entry))
+    if not misses:
+        return paths
+    # Each image goes to its own scratch file in the cache dir, never the shared
+    # data/frames/beat_NNN.png, so a concurrent run can't swap in another prompt's image.
+    scratch = [temp_path(entry) for _, _, _, entry in misses]
+    try:
+        produced = image_engine.render_batch(
+            pipe,
+            [prompt for _, prompt, _, _ in misses],
+            [idx for idx, _, _, _ in misses],
+            size=size,
+            seeds=[seed for _, _, seed, _ in misses],
+            out_paths=scratch,
+        )
+    except Exception:
+        LOGGER.exception("Image generation failed for %d beats; continuing without backgrounds.", len(misses))
+        for path in scratch:
+            if os.path.exists(path):
+                os.remove(path)
+        return paths
+    for (idx, prompt, _, entry), path in zip(misses, produced):
+        paths[idx] = store(path, entry)
+        LOGGER.debug("Generated background image for beat %d via prompt '%s'.", idx, prompt)
+    return paths
+
+
+async def _render_clip(spec: dict, per: float, title: str, bullets: List[str], W: int, H: int, FPS: int, encoder: str) -> str:
+    """``anim.render_async`` through the clip cache.
+
+    The encoder and renderer version are part of the key: clips from a different encoder
+    can't be concat-copied with fresh ones, and old renderer output must not be reused.
+    """
+    key = cache_key(
+        spec=spec, per=per, title=title, bullets=bullets, W=W, H=H, FPS=FPS,
+        encoder=encoder, version=anim.RENDER_VERSION,
+    )
+    return await cached_path_async(
+        "anim", key, lambda _: anim.render_async(spec, per, title, bullets, width=W, height=H, fps=FPS), ".mp4"
+    )
+
+
+async def _render_clips(plan, cfg, narration: str, voice, W: int, H: int, FPS: int) -> List[str]:
+    """Generate backgrounds and render one clip per beat (or a single fallback clip).
+
+    All backgrounds are generated in one batched job that starts right away; beats without
+    one render immediately, and each clip waits for ``voice`` only when it needs its duration.
+    """
+    encoder = await asyncio.to_thread(anim._video_encoder)
     image_mode = _image_mode(cfg)
     image_engine = None
     image_pipe = None
@@ -113,7 +329,7 @@ async def run(cfg):
         try:
             from . import images as image_module  # lazy import
 
-            image_pipe = image_module.get_pipe()
+            image_pipe = await asyncio.to_thread(image_module.get_pipe)
             image_engine = image_module
         except Exception as exc:
             LOGGER.exception("Image engine unavailable; disabling generated visuals.")
@@ -121,64 +337,41 @@ async def run(cfg):
             image_engine = None
             image_pipe = None
 
-    # 1) Voice + captions first
-    narration_raw = (plan.get("narration_full") or "").strip()
-    if _should_ignore_narration(narration_raw):
-        LOGGER.error(
-            "Narration from plan is invalid (topic=%s, words=%d).",
-            cfg.topic,
-            len(narration_raw.split()),
-        )
-        composed = _compose_narration(plan)
-        if composed:
-            LOGGER.error("Composed narration fallback generated %d words but fallback usage is disabled.", len(composed.split()))
-        raise ValueError("Narration invalid or too short; aborting render.")
-    narration = narration_raw
-    wav = tts.synthesize(narration, cfg.voice.speaker)
-    dur_s = sf.info(wav).duration if os.path.exists(wav) else (cfg.length.value * 60)
-    srt = captions.to_srt(wav)
-
     # 2) Build animations per beat
     flattened = _flatten_beats(plan)
     n = max(1, len(flattened))
-    per = max(4.0, dur_s / n)
 
     clips = []
+    size_px = min(1280, max(W, H))
     if flattened:
-        for idx, (sec, b) in enumerate(flattened):
+        clip_slots = asyncio.Semaphore(CLIP_CONCURRENCY)
+
+        # First pass: collect every beat's background prompt so the pipeline runs batched.
+        image_requests = []
+        if image_engine:
+            for idx, (sec, b) in enumerate(flattened):
+                _, subject, references = _beat_subject(cfg, sec, b)
+                assets = (b.get("onscreen", {}) or {}).get("assets", {}) or {}
+                need_image = assets.get("need_image", False) or bool(subject or references)
+                if image_mode == "force" or need_image:
+                    prompt = _build_image_prompt(cfg.topic, subject, references, (b.get("narration") or "").strip())
+                    image_requests.append((idx, prompt, _stable_seed(cfg.topic, sec.get("id"), idx)))
+        with_image = {idx for idx, _, _ in image_requests}
+        backgrounds = asyncio.ensure_future(
+            asyncio.to_thread(_render_backgrounds, image_engine, image_pipe, image_requests, size_px)
+        ) if image_requests else None
+
+        async def render_beat(idx, sec, b):
             btype = b.get("type")
             ons = b.get("onscreen", {}) or {}
-            title = ons.get("title") or sec.get("id") or cfg.topic
+            title, subject, references = _beat_subject(cfg, sec, b)
             bullets = ons.get("bullets", [])
             assets = ons.get("assets", {}) or {}
-            subject = assets.get("subject") or title
-            references = assets.get("reference_terms") or []
             spec_style = assets.get("style") or "kurzgesagt-flat-vector"
-            background_path = None
-            narration_snippet = (b.get("narration") or "").strip()
-            need_image = assets.get("need_image", False) or bool(subject or references)
-            if image_engine and (image_mode == "force" or need_image):
-                prompt = _build_image_prompt(cfg.topic, subject, references, narration_snippet)
-                try:
-                    size_px = max(W, H)
-                    bg_seed = abs(hash((cfg.topic, sec.get("id"), idx))) % 1_000_000
-                    background_path = image_engine.render(
-                        image_pipe,
-                        prompt,
-                        index=idx,
-                        size=min(1280, size_px),
-                        seed=bg_seed,
-                    )
-                    LOGGER.debug(
-                        "Generated background image for beat %d ('%s') via prompt '%s'.",
-                        idx,
-                        title,
-                        prompt,
-                    )
-                except Exception as exc:
-                    LOGGER.exception("Image generation failed for beat %d ('%s'); continuing without background.", idx, title)
-                    background_path = None
+            background_path = (await backgrounds).get(idx) if idx in with_image else None
 
+            _, dur_s = await voice
+            per = max(4.0, dur_s / n)
             spec = {"kind": "diagram"}
             if btype == "timeline":
                 spec = {"kind": "timeline", "items": bullets or ["Act I", "Act II", "Act III"]}
@@ -193,28 +386,31 @@ async def run(cfg):
             if background_path:
                 spec["background_image"] = background_path
             # layout -> diagram fallback with title/bullets
-            clip = anim.render(spec, per, title, bullets, width=W, height=H, fps=FPS)
-            clips.append(clip)
+            async with clip_slots:
+                return await _render_clip(spec, per, title, bullets, W, H, FPS, encoder)
+
+        tasks = [asyncio.ensure_future(render_beat(idx, sec, b)) for idx, (sec, b) in enumerate(flattened)]
+        if backgrounds is not None:
+            tasks.append(backgrounds)
+        try:
+            clips = list(await asyncio.gather(*tasks))[: len(flattened)]
+        except BaseException:
+            # One beat failed (or we were cancelled): stop the rest; render_async cleans up.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
     else:
         # Fallback: single title/diagram clip covering the whole narration duration
         title = (plan.get("topic") or cfg.topic)
         spec = {"kind": "diagram", "title": title, "style": "kurzgesagt-flat-vector", "subject": title}
         if image_engine and image_mode != "none":
-            try:
-                prompt = _build_image_prompt(cfg.topic, title, [], narration)
-                background_path = image_engine.render(image_pipe, prompt, index=0, size=min(1280, max(W, H)), seed=42)
-                spec["background_image"] = background_path
-            except Exception:
-                pass
-        clip = anim.render(spec, max(6.0, dur_s), title, [], width=W, height=H, fps=FPS)
+            prompt = _build_image_prompt(cfg.topic, title, [], narration)
+            backgrounds = await asyncio.to_thread(_render_backgrounds, image_engine, image_pipe, [(0, prompt, 42)], size_px)
+            if 0 in backgrounds:
+                spec["background_image"] = backgrounds[0]
+        _, dur_s = await voice
+        per = max(6.0, dur_s)
+        clip = await _render_clip(spec, per, title, [], W, H, FPS, encoder)
         clips.append(clip)
-
-    # 3) Compose final (concat -> add VO + subs) -- compose will also guard empty lists
-    out_name = f"{cfg.topic[:48].replace(' ', '_')}.mp4"
-    mp4 = render.compose(clips, wav, srt, fps=FPS, out_name=out_name)
-
-    return {
-        "plan": plan,
-        "assets": {"clips": clips, "wav": wav, "srt": srt},
-        "final_mp4": mp4,
-    }
+    return clips
@@ -1,60 +1,170 @@
 ﻿import os, subprocess, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .anim import _encoder_args, _video_encoder
 
 OUT = "data/final"
 os.makedirs(OUT, exist_ok=True)
 
+# Burning subtitles re-encodes the whole video; with at least SPLIT_MIN_CLIPS clips the
+# encode is split into this many clip groups that run in parallel, then concat-copied.
+COMPOSE_CHUNKS = int(os.getenv("LEARNGEN_COMPOSE_CHUNKS", "0")) or min(4, os.cpu_count() or 1)
+SPLIT_MIN_CLIPS = 8
+
+
+def _video_args(vf=None):
+    """(input, output) ffmpeg args for the clip encoder (NVENC/VA-API/libx264), with ``vf``
+    run ahead of any upload filter the encoder needs."""
+    input_args, output_args = _encoder_args(_video_encoder(), "medium", None)
+    if vf:
+        if "-vf" in output_args:
+            i = output_args.index("-vf") + 1
+            output_args = [*output_args[:i], f"{vf},{output_args[i]}", *output_args[i + 1:]]
+        else:
+            output_args = ["-vf", vf, *output_args]
+    return input_args, output_args
+
+
+def _concat_list(paths):
+    """Concat-demuxer script for ``paths``, fed to ffmpeg on stdin."""
+    cwd = os.getcwd()
+    return "".join(f"file '{os.path.normpath(os.path.join(cwd, p))}'\n" for p in paths).encode("utf-8")
+
+
+def _video_params(path):
+    """(codec, width, height, frame rate, pixel format) of the first video stream in ``path``."""
+    out = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,r_frame_rate,pix_fmt",
+        "-of", "csv=p=0", path
+    ], capture_output=True, check=True, text=True).stdout
+    return tuple(out.strip().split(","))
+
+
+def _duration(path):
+    out = subprocess.run([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path
+    ], capture_output=True, check=True, text=True).stdout
+    return float(out.strip())
+
+
+def _concat(paths, out_path):
+    # concat demuxer: inputs must match codec/size/fps (see _check_concat_compatible)
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-protocol_whitelist", "file,pipe",
+        "-i", "pipe:0", "-c", "copy", out_path
+    ], input=_concat_list(paths), check=True)
+
+
+def _burn_group(clips, start_s, srt, out_path):
+    # Shift timestamps so the subtitles filter sees this group's place in the full video.
+    srt = srt.replace("\\", "/")
+    vf = f"setpts=PTS+{start_s:.6f}/TB,subtitles={srt},setpts=PTS-STARTPTS"
+    input_args, output_args = _video_args(vf)
+    subprocess.run([
+        "ffmpeg", "-y", *input_args,
+        "-f", "concat", "-safe", "0", "-protocol_whitelist", "file,pipe", "-i", "pipe:0",
+        "-an", *output_args, out_path
+    ], input=_concat_list(clips), check=True)
 
-def _concat_filelist(paths, list_path):
-    with open(list_path, "w", encoding="utf-8") as f:
-        for p in paths:
-            f.write(f"file '{os.path.abspath(p)}'\n")
+
+def _burn_in_chunks(clips, srt, out_path):
+    """Concatenate ``clips`` with ``srt`` burned in, encoding COMPOSE_CHUNKS groups in parallel."""
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        durations = list(ex.map(_duration, clips))
+    size = -(-len(clips) // min(COMPOSE_CHUNKS, len(clips)))
+    starts = range(0, len(clips), size)
+    parts = []
+    try:
+        for _ in starts:
+            fd, part = tempfile.mkstemp(prefix="part_", suffix=".mp4", dir=OUT)
+            os.close(fd)
+            parts.append(part)
+        with ThreadPoolExecutor(max_workers=len(parts)) as ex:
+            list(ex.map(
+                lambda i, part: _burn_group(clips[i:i + size], sum(durations[:i]), srt, part),
+                starts,
+                parts,
+            ))
+        _concat(parts, out_path)
+    finally:
+        for part in parts:
+            os.remove(part)
+
+
+def _check_concat_compatible(clips):
+    # The concat demuxer with -c copy silently produces a broken file when clips differ
+    # (e.g. one encoded by NVENC and another by libx264), so fail early instead.
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        params = list(ex.map(_video_params, clips))
+    for clip, p in zip(clips[1:], params[1:]):
+        if p != params[0]:
+            raise ValueError(f"Clip {clip} has stream parameters {p}, expected {params[0]} ({clips[0]})")
 
 
 def _synthesize_blank_video(duration_s: float, fps: int, out_path: str, width=1920, height=1080):
     # Solid dark background for the given duration
+    input_args, output_args = _video_args()
     subprocess.run([
-        "ffmpeg", "-y",
-        "-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:d={max(1.0, duration_s)}",
-        "-vf", f"fps={fps},format=yuv420p",
-        "-c:v", "libx264", "-pix_fmt", "yuv420p",
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *input_args,
+        "-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={fps}:d={max(1.0, duration_s)}",
+        "-an", "-sn", "-dn",
+        *output_args,
         out_path
     ], check=True)
     return out_path
 
 
-def compose(clips, wav, srt, fps=30, out_name="final.mp4"):
+def compose(clips, wav, srt, fps=30, out_name="final.mp4", burn_subtitles=False):
     """
     1) Concatenate per-beat animation clips (or synthesize a blank if empty).
-    2) Mux narration (wav) and burn subtitles (srt).
+    2) Mux narration (wav) and subtitles (srt). Subtitles are added as a soft mov_text
+       track and the video is stream-copied; ``burn_subtitles`` renders them into the
+       picture instead, which re-encodes the whole video.
     """
     os.makedirs(OUT, exist_ok=True)
 
-    composed = os.path.join(OUT, "composed.mp4")
+    # Per-call intermediate (and the clip list on stdin) so concurrent composes don't collide.
+    fd, composed = tempfile.mkstemp(prefix="composed_", suffix=".mp4", dir=OUT)
+    os.close(fd)
+    try:
+        return _mux(clips, wav, srt, fps, composed, os.path.join(OUT, out_name), burn_subtitles)
+    finally:
+        os.remove(composed)
 
+
+def _mux(clips, wav, srt, fps, composed, final_path, burn_subtitles):
+    has_srt = bool(srt) and os.path.isfile(srt)
+    burn = burn_subtitles and has_srt
+    split = burn and COMPOSE_CHUNKS > 1 and len(clips) >= SPLIT_MIN_CLIPS
     if clips:
-        tmp_list = os.path.join(OUT, "clips.txt")
-        _concat_filelist(clips, tmp_list)
-        # concat demuxer: inputs must match codec/size/fps (our anims do)
-        subprocess.run([
-            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", tmp_list,
-            "-c", "copy", composed
-        ], check=True)
+        _check_concat_compatible(clips)
+        if split:
+            _burn_in_chunks(clips, srt, composed)
+        else:
+            _concat(clips, composed)
     else:
         # As a last resort (shouldn't happen after orchestrator fix), create a 10s blank
         _synthesize_blank_video(10.0, fps, composed)
 
-    final_path = os.path.join(OUT, out_name)
-    # Burn subtitles and add audio; if srt is missing, drop the filter
-    vf = []
-    if srt and os.path.isfile(srt):
-        vf = ["-vf", "subtitles=" + srt.replace("\\", "/")]
-
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", composed, "-i", wav,
-        "-c:v", "libx264", "-c:a", "aac", "-shortest",
-        *vf,
-        final_path
-    ]
+    if burn and not split:
+        input_args, output_args = _video_args("subtitles=" + srt.replace("\\", "/"))
+        cmd = [
+            "ffmpeg", "-y", *input_args,
+            "-i", composed, "-i", wav,
+            *output_args, "-c:a", "aac", "-shortest",
+            final_path
+        ]
+    else:
+        # Video is already H.264 (subtitles burned in, when split); only the audio needs encoding.
+        subs_in = ["-i", srt] if has_srt and not burn else []
+        subs_out = ["-map", "2:s", "-c:s", "mov_text"] if subs_in else []
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", composed, "-i", wav, *subs_in,
+            "-map", "0:v", "-map", "1:a", *subs_out,
+            "-c:v", "copy", "-c:a", "aac", "-shortest",
+            final_path
+        ]
     subprocess.run(cmd, check=True)
     return final_path
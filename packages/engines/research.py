@@ -1,36 +1,97 @@
 # packages/engines/research.py
 # Web search gatherer: prefers Google CSE if keys are set; falls back to Wikipedia + optional URLs.
 
-import os, re, json, html
+import os, re, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
 from urllib.parse import quote
 from urllib.request import Request, urlopen
 
+import orjson
+from selectolax.parser import HTMLParser
+
+from ._cache import cache_entry, store, temp_path
+
 UA = "learn-gen/0.1 (+https://example.com)"
+FETCH_WORKERS = 8
+_WS_RE = re.compile(r"\s+")
+
+# Fetched responses are kept on disk and reused for this long; after that they are
+# revalidated with If-None-Match / If-Modified-Since, so unchanged pages cost a 304.
+API_MAX_AGE = 24 * 3600
+PAGE_MAX_AGE = 7 * 24 * 3600
+
+def _write_atomic(path, data):
+    tmp = temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    store(tmp, path)
+
+def _http_get_bytes(url, timeout=12, max_age=PAGE_MAX_AGE):
+    body_path = cache_entry("http", url.encode("utf-8"), ".body")
+    meta_path = body_path[: -len(".body")] + ".json"
+    meta = None
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        try:
+            with open(meta_path, "rb") as f:
+                meta = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            meta = None
+    if meta and time.time() - meta.get("fetched_at", 0) < max_age:
+        with open(body_path, "rb") as f:
+            return f.read()
+
+    headers = {"User-Agent": UA}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as r:
+            body = r.read()
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    except HTTPError as exc:
+        if exc.code != 304 or not meta:
+            raise
+        with open(body_path, "rb") as f:
+            body = f.read()
+        etag, last_modified = meta.get("etag"), meta.get("last_modified")
+    else:
+        _write_atomic(body_path, body)
+    _write_atomic(meta_path, orjson.dumps({"etag": etag, "last_modified": last_modified, "fetched_at": time.time()}))
+    return body
 
 def _http_get(url, timeout=12):
-    req = Request(url, headers={"User-Agent": UA})
-    with urlopen(req, timeout=timeout) as r:
-        return r.read().decode("utf-8", errors="ignore")
+    return _http_get_bytes(url, timeout).decode("utf-8", errors="ignore")
 
 def _strip_html(text):
-    text = re.sub(r"(?is)<script.*?>.*?</script>", " ", text)
-    text = re.sub(r"(?is)<style.*?>.*?</style>", " ", text)
-    text = re.sub(r"(?s)<[^>]+>", " ", text)
-    text = html.unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    # selectolax (lexbor) parses in C and decodes entities; far cheaper than regex passes.
+    tree = HTMLParser(text)
+    tree.strip_tags(["script", "style"])
+    node = tree.body or tree.root
+    text = node.text(separator=" ") if node is not None else ""
+    return _WS_RE.sub(" ", text).strip()
+
+def _fetch_text(url, timeout=12):
+    try:
+        return _strip_html(_http_get(url, timeout))
+    except Exception:
+        return None
 
 def wiki_search(topic, lang="en", max_chars=6000):
     q = quote(topic)
     try:
-        search_json = _http_get(f"https://{lang}.wikipedia.org/w/api.php?action=query&list=search&format=json&srsearch={q}")
-        data = json.loads(search_json)
+        search_json = _http_get_bytes(
+            f"https://{lang}.wikipedia.org/w/api.php?action=query&list=search&format=json&srsearch={q}",
+            max_age=API_MAX_AGE,
+        )
+        data = orjson.loads(search_json)
         hits = data.get("query", {}).get("search", [])
         if not hits:
             return []
         title = hits[0]["title"]
-        page_json = _http_get(f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{quote(title)}")
-        p = json.loads(page_json)
+        page_json = _http_get_bytes(f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{quote(title)}", max_age=API_MAX_AGE)
+        p = orjson.loads(page_json)
         txt = " ".join([p.get("title",""), p.get("description","") or "", p.get("extract","")])
         url = (
             p.get("content_urls", {}).get("desktop", {}).get("page")
@@ -69,21 +130,19 @@ def gather(topic, extra_urls=None, use_google_if_available=True):
     if not sources:
         sources += wiki_search(topic)
 
-    # Add any user-provided URLs
-    for u in (extra_urls or []):
-        try:
-            raw = _http_get(u)
-            txt = _strip_html(raw)
-            sources.append({"title": u, "url": u, "text": txt[:12000]})
-        except Exception:
-            pass
+    # Add any user-provided URLs (fetched concurrently, kept in the given order)
+    urls = list(extra_urls or [])
+    if urls:
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(urls))) as ex:
+            for u, txt in zip(urls, ex.map(_fetch_text, urls)):
+                if txt is not None:
+                    sources.append({"title": u, "url": u, "text": txt[:12000]})
 
     # Simple scoring: length + keyword hits
     keys = [k for k in topic.lower().split() if len(k) > 2]
     def score(t):
-        s = len(t)
-        s += sum(5 for k in keys if k in t.lower())
-        return s
+        low = t.lower()
+        return len(t) + 5 * sum(k in low for k in keys)
 
     chunks = []
     for i, s in enumerate(sources, start=1):
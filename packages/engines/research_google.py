@@ -1,24 +1,16 @@
 # packages/engines/research_google.py
 # Google Custom Search JSON API wrapper with query templates & quality site hints
 
-import json, os, html, re
+import os
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
-UA = "learn-gen/0.1 (+https://example.com)"
+import orjson
 
-def _http_get(url, timeout=15):
-    req = Request(url, headers={"User-Agent": UA})
-    with urlopen(req, timeout=timeout) as r:
-        return r.read().decode("utf-8", errors="ignore")
+from .research import FETCH_WORKERS, _fetch_text, _http_get_bytes
 
-def _strip_html(text: str) -> str:
-    text = re.sub(r"(?is)<script.*?>.*?</script>", " ", text)
-    text = re.sub(r"(?is)<style.*?>.*?</style>", " ", text)
-    text = re.sub(r"(?s)<[^>]+>", " ", text)
-    text = html.unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+# Search results change faster than the pages they point to.
+SEARCH_MAX_AGE = 3600
 
 def _query_for(topic: str) -> list[str]:
     t = topic.lower()
@@ -41,29 +33,35 @@ def search_and_fetch(topic: str, max_results: int = 6):
     if not api_key or not cx:
         return []
 
-    results = []
+    links = []
     seen = set()
     for qtext in _query_for(topic):
         q = urlencode({"key": api_key, "cx": cx, "q": qtext})
         url = f"https://www.googleapis.com/customsearch/v1?{q}"
         try:
-            data = json.loads(_http_get(url))
+            data = orjson.loads(_http_get_bytes(url, 15, max_age=SEARCH_MAX_AGE))
         except Exception:
             continue
         for it in (data.get("items") or []):
             link = it.get("link")
-            title = it.get("title") or link
             if not link or link in seen:
                 continue
             seen.add(link)
-            try:
-                raw = _http_get(link, timeout=15)
-                txt = _strip_html(raw)
-                if len(txt) < 800:   # skip thin pages
-                    continue
-                results.append({"title": title, "url": link, "text": txt[:16000]})
-                if len(results) >= max_results:
-                    return results
-            except Exception:
+            links.append((it.get("title") or link, link))
+
+    # Pages are fetched concurrently; results keep search order. Once max_results good
+    # pages are in, queued fetches are cancelled and in-flight ones are not waited for.
+    results = []
+    ex = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    try:
+        futures = [ex.submit(_fetch_text, link, 15) for _, link in links]
+        for (title, link), future in zip(links, futures):
+            txt = future.result()
+            if txt is None or len(txt) < 800:   # failed or thin page
                 continue
+            results.append({"title": title, "url": link, "text": txt[:16000]})
+            if len(results) >= max_results:
+                break
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
     return results
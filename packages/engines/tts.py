@@ -8,7 +8,10 @@ def synthesize(text: str, model_path: str):
     Example voices: https://github.com/rhasspy/piper/releases/tag/v0.0.2
     """
     os.makedirs(OUT, exist_ok=True)
-    wav_path = os.path.join(OUT, f"narr_{uuid.uuid4().hex}.wav")
+    return synthesize_to(text, model_path, os.path.join(OUT, f"narr_{uuid.uuid4().hex}.wav"))
+
+def synthesize_to(text: str, model_path: str, wav_path: str):
+    """Like ``synthesize`` but writes the narration to ``wav_path``."""
     # Piper usage: piper -m <model.onnx> -f <output.wav>
     cmd = ["piper", "-m", model_path, "-f", wav_path]
     subprocess.run(cmd, input=text.encode("utf-8"), check=True)